@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Pipe
+
+import numpy as np
+
+from reskin_sensor import ReSkinBase, ReSkinDummy, ReSkinRaw
+from reskin_sensor.buffer import SpillBuffer
+from reskin_sensor.sensor import ReSkinData
+
+
+def synthetic_stream(num_mags, num_frames, seed=0):
+    """Burst mode byte stream, as sent by the sensor"""
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(-300.0, 300.0, size=(num_frames, 4 * num_mags))
+    frame = struct.Struct("@{}fcc".format(4 * num_mags))
+    return [frame.pack(*v, b"\r", b"\n") for v in values.tolist()]
+
+
+class FixedSensor(ReSkinDummy):
+    """Dummy sensor returning the same sample, to time packaging alone"""
+
+    def get_sample(self, num_samples=1, timeout=None):
+        return self._sample
+
+
+class StreamSensor(ReSkinDummy):
+    """
+    ReSkinBase decoding from an in-memory stream instead of a serial port.
+    At most 4000 bytes are reported as waiting, as a serial port that is
+    kept up with would
+    """
+
+    get_sample = ReSkinBase.get_sample
+
+    def load(self, stream):
+        self._stream = io.BytesIO(stream)
+        self._stream_len = len(stream)
+
+    @property
+    def in_waiting(self):
+        return min(self._stream_len - self._stream.tell(), 4000)
+
+    def read(self, size=1):
+        return self._stream.read(size)
+
+    def read_until(self, expected=b"\n", size=None):
+        line = b""
+        while not line.endswith(expected):
+            byte = self._stream.read(1)
+            if not byte:
+                break
+            line += byte
+        return line
+
+    def readline(self):
+        return self._stream.readline()
+
+    def reset_input_buffer(self):
+        self._stream.seek(0, io.SEEK_END)
+
+
+def preload(sensor, stream):
+    """Puts stream in the read buffer of a ReSkinRaw, as if it had been read"""
+    sensor._buf[: len(stream)] = stream
+    sensor._start, sensor._end = 0, len(stream)
+
+
+def bench_decode_raw(sensor, stream):
+    preload(sensor, stream)
+    start = time.perf_counter()
+    while sensor._next_frame() is not None:
+        pass
+    return time.perf_counter() - start
+
+
+def bench_step(sensor, stream, num_frames, step):
+    """Time spent in one profiled step of get_sample, for a StreamSensor"""
+    sensor.load(stream)
+    sensor.reset_profile()
+    sensor.enable_profiling()
+    for _ in range(num_frames):
+        sensor.get_sample()
+    sensor.disable_profiling()
+    return sensor.get_profile()[step]["total"]
+
+
+def bench_get_sample(sensor, stream, num_frames):
+    preload(sensor, stream)
+    start = time.perf_counter()
+    for _ in range(num_frames):
+        sensor.get_sample()
+    return time.perf_counter() - start
+
+
+def bench_package(sensor, num_frames):
+    start = time.perf_counter()
+    sensor.get_data(num_frames)
+    return time.perf_counter() - start
+
+
+def bench_buffer_list(samples):
+    buffer = []
+    start = time.perf_counter()
+    for s in samples:
+        buffer.append(s)
+    return time.perf_counter() - start
+
+
+def bench_buffer_spill(samples, num_columns):
+    with tempfile.TemporaryDirectory(prefix="reskin_bench_") as spill_dir:
+        buffer = SpillBuffer(
+            num_columns, chunk_size=1000, mem_limit=1 << 20, spill_dir=spill_dir
+        )
+        start = time.perf_counter()
+        for s in samples:
+            buffer.append(s)
+        elapsed = time.perf_counter() - start
+        buffer.close()
+    return elapsed
+
+
+def bench_pipe(samples, chunk_size=10000):
+    pipe_in, pipe_out = Pipe()
+    num_chunks = (len(samples) + chunk_size - 1) // chunk_size
+    reader = threading.Thread(
+        target=lambda: [pipe_in.recv() for _ in range(num_chunks)]
+    )
+    reader.start()
+    start = time.perf_counter()
+    for i in range(0, len(samples), chunk_size):
+        pipe_out.send(samples[i : i + chunk_size])
+    reader.join()
+    return time.perf_counter() - start
+
+
+def run_benchmarks(num_mags, num_frames, repeats):
+    """
+    Returns the best time per frame, in us, for every benchmark
+    """
+    frames = synthetic_stream(num_mags, num_frames)
+    stream = b"".join(frames)
+
+    # ReSkinBase only reads a frame once more than a frame is waiting
+    base_sensor = StreamSensor(num_mags=num_mags, temp_filtered=True)
+    base_stream = stream + frames[-1]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw_sensor = ReSkinRaw(
+            num_mags=num_mags, port="loop://", temp_filtered=True, read_size=len(stream)
+        )
+    # Frames are decoded through the library path, from a preloaded buffer
+    # rather than the port, so that I/O is left out
+    preload(raw_sensor, stream)
+    masked = [raw_sensor.get_sample()[2] for _ in range(num_frames)]
+
+    fixed_sensor = FixedSensor(num_mags=num_mags, temp_filtered=True)
+    fixed_sensor._sample = (time.time(), 0.0, masked[0])
+    samples = [
+        ReSkinData(time=float(i), acq_delay=0.0, data=m, dev_id=0)
+        for i, m in enumerate(masked)
+    ]
+
+    benchmarks = {
+        "decode": lambda: bench_step(base_sensor, base_stream, num_frames, "decode"),
+        "decode_raw": lambda: bench_decode_raw(raw_sensor, stream),
+        "mask": lambda: bench_step(base_sensor, base_stream, num_frames, "mask"),
+        "get_sample": lambda: bench_get_sample(raw_sensor, stream, num_frames),
+        "package": lambda: bench_package(fixed_sensor, num_frames),
+        "buffer_list": lambda: bench_buffer_list(samples),
+        "buffer_spill": lambda: bench_buffer_spill(samples, len(masked[0]) + 3),
+        "pipe": lambda: bench_pipe(samples),
+    }
+    results = {}
+    for name, bench in benchmarks.items():
+        best = min(bench() for _ in range(repeats))
+        results[name] = 1e6 * best / num_frames
+    raw_sensor.close()
+    return results
+
+
+if __name__ == "__main__":
+    # fmt: off
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the ReSkin decode hot path")
+    parser.add_argument("-n", "--num_mags", type=int, help="number of magnetometers on the sensor board", default=5,)
+    parser.add_argument("-f", "--num_frames", type=int, help="number of synthetic frames per benchmark", default=10000,)
+    parser.add_argument("-r", "--repeats", type=int, help="number of repeats; the best time is reported", default=5,)
+    parser.add_argument("--baseline", type=str, help="path to baseline results", default=os.path.join(os.path.dirname(__file__), "baseline.json"),)
+    parser.add_argument("--save", action="store_true", help="flag to save results as the new baseline",)
+    parser.add_argument("--threshold", type=float, help="relative slowdown over baseline flagged as a regression", default=0.2,)
+    # fmt: on
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.num_mags, args.num_frames, args.repeats)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    regressions = []
+    print("{:<14}{:>12}{:>12}{:>10}".format("Benchmark", "us/frame", "Baseline", "Change"))
+    for name, us in results.items():
+        if name in baseline:
+            change = us / baseline[name] - 1.0
+            flag = ""
+            if change > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append(name)
+            print("{:<14}{:>12.3f}{:>12.3f}{:>+9.1%}{}".format(name, us, baseline[name], change, flag))
+        else:
+            print("{:<14}{:>12.3f}{:>12}{:>10}".format(name, us, "-", "-"))
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=4)
+        print("Baseline saved to {}".format(args.baseline))
+
+    # A run saved as the new baseline is not a failure
+    if regressions and not args.save:
+        print("Regressions beyond {:.0%}: {}".format(args.threshold, ", ".join(regressions)))
+        sys.exit(1)
@@ -1,2 +1,5 @@
 from .sensor import ReSkinBase, ReSkinDummy
+from .sensor_raw import ReSkinRaw
 from .sensor_proc import ReSkinProcess
+from .buffer import ReSkinBuffer
+from .dataset import ReSkinDataset
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import functools
+import glob
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from .sensor import get_temp_mask
+
+PIPELINE_STEPS = ("baseline", "temp_filter", "stats", "contacts")
+
+
+def channel_labels(num_mags, temp_filtered):
+    """Returns labels for the channels of a recording, in order"""
+    labels = []
+    for m in range(num_mags):
+        labels.extend(["T{}".format(m), "Bx{}".format(m), "By{}".format(m), "Bz{}".format(m)])
+    return [l for l, keep in zip(labels, get_temp_mask(num_mags, temp_filtered)) if keep]
+
+
+def process_recording(
+    path,
+    num_mags,
+    steps=PIPELINE_STEPS,
+    baseline_samples=100,
+    contact_threshold=50.0,
+    chunk_size=100000,
+):
+    """
+    Runs the processing pipeline over a single recording.
+
+    The recording is memory-mapped and processed in chunks of chunk_size
+    samples, so memory use does not grow with the length of the recording.
+
+    Parameters
+    ----------
+    path: str
+        Path to a .npy recording with rows [time, acq_delay, channels..., dev_id],
+        as returned by get_data with reskin_data_struct=False
+    num_mags: int
+        Number of magnetometers on the sensor that produced the recording
+    steps: tuple
+        Pipeline steps to run, any of PIPELINE_STEPS
+    baseline_samples: int
+        Number of initial samples averaged to compute the baseline
+    contact_threshold: float
+        Magnitude of the baseline-subtracted field on any magnetometer above
+        which the sensor is considered to be in contact
+    chunk_size: int
+        Number of samples processed at a time
+
+    Returns
+    -------
+    dict
+        Summary of the recording, keyed by column name
+    """
+    data = np.load(path, mmap_mode="r")
+    num_samples = data.shape[0]
+    num_channels = data.shape[1] - 3
+
+    # Recordings may or may not include temperature
+    has_temp = num_channels == 4 * num_mags
+    if not has_temp and num_channels != 3 * num_mags:
+        raise ValueError(
+            "{}: {} channels do not match {} magnetometers".format(
+                path, num_channels, num_mags
+            )
+        )
+
+    if has_temp and "temp_filter" in steps:
+        channel_mask = get_temp_mask(num_mags, temp_filtered=True)
+        labels = channel_labels(num_mags, temp_filtered=True)
+    else:
+        channel_mask = np.ones((num_channels,), dtype=bool)
+        labels = channel_labels(num_mags, temp_filtered=not has_temp)
+    # Indices of magnetic field channels after masking, for contact detection
+    field_idx = np.array([i for i, l in enumerate(labels) if not l.startswith("T")])
+
+    baseline = np.zeros((int(np.sum(channel_mask)),))
+    if "baseline" in steps and num_samples > 0:
+        baseline = np.mean(
+            data[:baseline_samples, 2:-1][:, channel_mask], axis=0, dtype=np.float64
+        )
+
+    summary = {
+        "path": path,
+        "num_samples": num_samples,
+        "duration": float(data[-1, 0] - data[0, 0]) if num_samples > 0 else 0.0,
+    }
+
+    count = 0
+    ch_sum = np.zeros_like(baseline)
+    ch_sumsq = np.zeros_like(baseline)
+    ch_min = np.full_like(baseline, np.inf)
+    ch_max = np.full_like(baseline, -np.inf)
+
+    num_contacts = 0
+    contact_time = 0.0
+    in_contact = False
+    contact_start = 0.0
+
+    for start in range(0, num_samples, chunk_size):
+        chunk = data[start : start + chunk_size]
+        times = chunk[:, 0]
+        channels = chunk[:, 2:-1][:, channel_mask] - baseline
+
+        if "stats" in steps:
+            count += len(channels)
+            ch_sum += np.sum(channels, axis=0)
+            ch_sumsq += np.sum(np.square(channels), axis=0)
+            np.minimum(ch_min, np.min(channels, axis=0), out=ch_min)
+            np.maximum(ch_max, np.max(channels, axis=0), out=ch_max)
+
+        if "contacts" in steps:
+            field = channels[:, field_idx].reshape(len(channels), num_mags, 3)
+            contact = np.any(np.linalg.norm(field, axis=-1) > contact_threshold, axis=-1)
+
+            # Transitions, including the one carried over from the last chunk
+            changes = np.flatnonzero(np.diff(contact, prepend=in_contact))
+            for c in changes:
+                if contact[c]:
+                    num_contacts += 1
+                    contact_start = times[c]
+                else:
+                    contact_time += times[c] - contact_start
+            in_contact = bool(contact[-1])
+
+    if "stats" in steps and count > 0:
+        mean = ch_sum / count
+        std = np.sqrt(np.maximum(ch_sumsq / count - np.square(mean), 0.0))
+        for stat, values in (("mean", mean), ("std", std), ("min", ch_min), ("max", ch_max)):
+            for label, v in zip(labels, values):
+                summary["{}_{}".format(stat, label)] = float(v)
+
+    if "contacts" in steps:
+        if in_contact:
+            contact_time += data[-1, 0] - contact_start
+        summary["num_contacts"] = num_contacts
+        summary["contact_time"] = float(contact_time)
+
+    return summary
+
+
+def _try_process_recording(path, **kwargs):
+    """
+    Runs process_recording, recording any error in the "error" column of the
+    summary instead of raising it, so that one bad file does not stop a batch
+    """
+    try:
+        summary = process_recording(path, **kwargs)
+        summary["error"] = ""
+    except Exception as e:
+        summary = {"path": path, "error": "{}: {}".format(type(e).__name__, e)}
+    return summary
+
+
+def save_summary(summaries, output_path):
+    """
+    Writes per-recording summaries as columns, one entry per recording.
+
+    Output is a .csv file if output_path ends in .csv, and a .npz file with
+    one array per column otherwise.
+    """
+    columns = []
+    for s in summaries:
+        columns.extend(k for k in s if k not in columns)
+    table = {
+        k: np.array([s.get(k, np.nan) for s in summaries]) for k in columns
+    }
+
+    if output_path.endswith(".csv"):
+        with open(output_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*(table[k] for k in columns)))
+    else:
+        np.savez(output_path, **table)
+
+
+def process_directory(data_dir, output_path, num_workers=None, **kwargs):
+    """
+    Runs the processing pipeline over every .npy recording under data_dir
+    on a pool of worker processes, and saves a consolidated summary.
+    Recordings that fail are listed in the summary with the error in the
+    "error" column, and NaN in the others.
+
+    Parameters
+    ----------
+    data_dir: str
+        Directory searched recursively for recordings
+    output_path: str
+        Path for the consolidated summary
+    num_workers: int
+        Number of worker processes; defaults to the number of CPUs
+    **kwargs:
+        Passed on to process_recording
+    """
+    paths = sorted(
+        glob.glob(os.path.join(data_dir, "**", "*.npy"), recursive=True)
+    )
+    if len(paths) == 0:
+        print("No recordings found in {}".format(data_dir))
+        return []
+
+    with Pool(num_workers) as pool:
+        summaries = pool.map(
+            functools.partial(_try_process_recording, **kwargs), paths, chunksize=1
+        )
+
+    save_summary(summaries, output_path)
+    print("Processed {} recordings. Summary saved to {}".format(len(paths), output_path))
+    for s in summaries:
+        if s["error"]:
+            print("Failed to process {}: {}".format(s["path"], s["error"]))
+    return summaries
+
+
+if __name__ == "__main__":
+    # fmt: off
+    parser = argparse.ArgumentParser(description="Batch process a directory of ReSkin recordings")
+    parser.add_argument("-d", "--data-dir", type=str, required=True, help="Directory containing .npy recordings")
+    parser.add_argument("-o", "--output", type=str, default="summary.npz", help="Path for the consolidated summary (.npz or .csv)")
+    parser.add_argument("-nm", "--num-mags", type=int, required=True, help="Number of magnetometers")
+    parser.add_argument("-s", "--steps", type=str, nargs="+", choices=PIPELINE_STEPS, default=list(PIPELINE_STEPS), help="Pipeline steps to run")
+    parser.add_argument("-j", "--num-workers", type=int, default=None, help="Number of worker processes; defaults to number of CPUs")
+    parser.add_argument("-bs", "--baseline-samples", type=int, default=100, help="Number of initial samples used for the baseline")
+    parser.add_argument("-ct", "--contact-threshold", type=float, default=50., help="Field magnitude above which contact is detected")
+    parser.add_argument("-cs", "--chunk-size", type=int, default=100000, help="Number of samples processed at a time")
+    args = parser.parse_args()
+    # fmt: on
+
+    process_directory(
+        args.data_dir,
+        args.output,
+        num_workers=args.num_workers,
+        num_mags=args.num_mags,
+        steps=tuple(args.steps),
+        baseline_samples=args.baseline_samples,
+        contact_threshold=args.contact_threshold,
+        chunk_size=args.chunk_size,
+    )
@@ -0,0 +1,212 @@
+import collections.abc
+import os
+import tempfile
+
+import numpy as np
+
+from .sensor import ReSkinData
+
+
+def spill_chunk(chunk, spill_dir=None):
+    """Writes an array of rows to a temporary file, and memory-maps it"""
+    with tempfile.NamedTemporaryFile(
+        prefix="reskin_", suffix=".bin", dir=spill_dir, delete=False
+    ) as f:
+        chunk.tofile(f)
+    return load_spilled(f.name, len(chunk), chunk.shape[1])
+
+
+def load_spilled(path, num_rows, num_columns):
+    """Memory-maps rows stored in a spill file, and deletes the file"""
+    rows = None
+    if num_rows > 0:
+        rows = np.memmap(path, dtype=np.float64, mode="r", shape=(num_rows, num_columns))
+    try:
+        # The mapping stays valid after the file is unlinked on POSIX
+        # systems. Elsewhere, the file is left in the temporary directory
+        os.unlink(path)
+    except OSError:
+        pass
+    return rows
+
+
+class SpillBuffer:
+    """
+    Buffer of samples with bounded memory use. Samples are held as rows
+    [time, acq_delay, data..., dev_id] in fixed-size chunks, and once more
+    than mem_limit bytes are in use, the oldest chunks are written to a
+    temporary file.
+
+    Attributes
+    ----------
+    num_columns: int
+        Number of values in a row
+    chunk_size: int
+        Number of rows in a chunk
+    mem_limit: int
+        Maximum number of bytes held in memory. At least one chunk is
+        always held in memory
+    spill_dir: str
+        Directory for the temporary file; system default if None
+    """
+
+    def __init__(self, num_columns, chunk_size, mem_limit, spill_dir=None):
+        self.num_columns = num_columns
+        self.chunk_size = chunk_size
+        self.mem_limit = mem_limit
+        self.spill_dir = spill_dir
+
+        chunk_bytes = chunk_size * num_columns * np.dtype(np.float64).itemsize
+        self._max_chunks = max(1, mem_limit // chunk_bytes)
+
+        self._chunks = []
+        self._current = np.empty((chunk_size, num_columns))
+        self._fill = 0
+        self._spill_file = None
+        self._spill_rows = 0
+
+    def __len__(self):
+        return self._spill_rows + len(self._chunks) * self.chunk_size + self._fill
+
+    def append(self, sample):
+        """
+        Append a sample, given as ReSkinData or as a row
+        """
+        row = self._current[self._fill]
+        if isinstance(sample, ReSkinData):
+            row[0] = sample.time
+            row[1] = sample.acq_delay
+            row[2:-1] = sample.data
+            row[-1] = sample.dev_id
+        else:
+            row[:] = sample
+        self._fill += 1
+
+        if self._fill == self.chunk_size:
+            self._chunks.append(self._current)
+            if len(self._chunks) + 1 > self._max_chunks:
+                # Spill the oldest chunk and reuse its memory
+                self._current = self._chunks.pop(0)
+                self._spill(self._current)
+            else:
+                self._current = np.empty((self.chunk_size, self.num_columns))
+            self._fill = 0
+
+    def _spill(self, chunk):
+        if self._spill_file is None:
+            self._spill_file = tempfile.NamedTemporaryFile(
+                prefix="reskin_", suffix=".bin", dir=self.spill_dir, delete=False
+            )
+        chunk.tofile(self._spill_file)
+        self._spill_rows += len(chunk)
+
+    def close(self):
+        """Discards the contents of the buffer, deleting the spill file"""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            try:
+                os.unlink(self._spill_file.name)
+            except OSError:
+                pass
+            self._spill_file = None
+            self._spill_rows = 0
+        self._chunks = []
+        self._fill = 0
+
+    def drain(self):
+        """
+        Yields the contents of the buffer, oldest first, removing them from
+        the buffer as they are yielded. The spilled part is yielded as a
+        (path, num_rows, num_columns) tuple, and the rest as arrays of rows.
+        The reader is responsible for deleting the file at path.
+        """
+        if self._spill_file is not None:
+            self._spill_file.close()
+            msg = (self._spill_file.name, self._spill_rows, self.num_columns)
+            self._spill_file = None
+            self._spill_rows = 0
+            yield msg
+        while len(self._chunks) > 0:
+            yield self._chunks.pop(0)
+        if self._fill > 0:
+            chunk = self._current[: self._fill].copy()
+            self._fill = 0
+            yield chunk
+
+
+class ReSkinBuffer(collections.abc.Sequence):
+    """
+    Read-only view over buffered samples, held in a mix of memory-mapped
+    spill files and in-memory chunks. Chunks are only concatenated when a
+    slice or array is requested.
+
+    Attributes
+    ----------
+    reskin_data_struct: bool
+        Flag indicating whether single samples are returned as ReSkinData
+        or as rows [time, acq_delay, data..., dev_id]
+
+    Methods
+    -------
+    chunks():
+        Iterate over the underlying arrays of rows, oldest first
+    to_array():
+        Return all samples as a single array of rows
+    """
+
+    def __init__(self, reskin_data_struct: bool = True):
+        self.reskin_data_struct = reskin_data_struct
+        self._chunks = []
+        self._offsets = [0]
+
+    def add_chunk(self, chunk):
+        """Append an array of rows"""
+        if len(chunk) > 0:
+            self._chunks.append(chunk)
+            self._offsets.append(self._offsets[-1] + len(chunk))
+
+    def add_spilled(self, path, num_rows, num_columns):
+        """Append rows stored in a spill file, deleting the file"""
+        rows = load_spilled(path, num_rows, num_columns)
+        if rows is not None:
+            self.add_chunk(rows)
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return self.to_array()[idx]
+            pieces = [
+                chunk[max(start - offset, 0) : max(stop - offset, 0)]
+                for chunk, offset in zip(self._chunks, self._offsets)
+            ]
+            pieces = [p for p in pieces if len(p) > 0]
+            if len(pieces) == 0:
+                return np.empty((0, self._chunks[0].shape[1] if self._chunks else 0))
+            return np.concatenate(pieces)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Buffer index out of range")
+
+        c = int(np.searchsorted(self._offsets, idx, side="right")) - 1
+        row = np.array(self._chunks[c][idx - self._offsets[c]])
+        if self.reskin_data_struct:
+            return ReSkinData(
+                time=row[0], acq_delay=row[1], data=row[2:-1], dev_id=int(row[-1])
+            )
+        return row
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_array() if dtype is None else self.to_array().astype(dtype)
+
+    def chunks(self):
+        return iter(self._chunks)
+
+    def to_array(self):
+        if len(self._chunks) == 0:
+            return np.empty((0, 0))
+        return np.concatenate(self._chunks)
@@ -0,0 +1,228 @@
+import collections
+import queue
+import threading
+
+import numpy as np
+
+from .sensor import get_temp_mask
+
+
+def _read_shape(path):
+    """Returns the shape of the array in a .npy file, read from its header"""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            return np.lib.format.read_array_header_1_0(f)[0]
+        if version == (2, 0):
+            return np.lib.format.read_array_header_2_0(f)[0]
+    # No public reader for newer header versions
+    return np.load(path, mmap_mode="r").shape
+
+
+class ReSkinDataset:
+    """
+    Fixed-length windows over a set of recorded ReSkin sessions.
+
+    Recordings are .npy files with rows [time, acq_delay, channels..., dev_id],
+    as returned by get_data with reskin_data_struct=False. Files are
+    memory-mapped when first used, so windows are only read from disk when
+    they are used, and at most max_open_files of them are kept open.
+
+    Attributes
+    ----------
+    paths: list
+        Paths to recordings
+    window_size: int
+        Number of samples in a window
+    stride: int
+        Number of samples between the starts of consecutive windows
+    num_mags: int
+        Number of magnetometers; only required if temp_filtered is True
+    temp_filtered: bool
+        Flag indicating if temperature columns should be dropped from windows.
+        Ignored for recordings that do not contain temperature
+    channels_only: bool
+        Flag indicating if only the channel columns should be returned,
+        without time, acq_delay and dev_id
+    max_open_files: int
+        Number of recordings kept memory-mapped at a time; the least recently
+        used one is closed to make room for another
+
+    Methods
+    -------
+    batches(batch_size, shuffle=True, drop_last=False, seed=None, num_prefetch=2):
+        Yields batches of windows, prefetched on a background thread
+    """
+
+    def __init__(
+        self,
+        paths,
+        window_size: int,
+        stride: int = 1,
+        num_mags: int = None,
+        temp_filtered: bool = False,
+        channels_only: bool = False,
+        max_open_files: int = 64,
+    ):
+        """Initializes a ReSkinDataset object."""
+        self.paths = list(paths)
+        self.window_size = window_size
+        self.stride = stride
+        self.num_mags = num_mags
+        self.temp_filtered = temp_filtered
+        self.channels_only = channels_only
+        self.max_open_files = max_open_files
+
+        # Recordings are indexed from their headers, and only mapped when read
+        self._shapes = [_read_shape(p) for p in self.paths]
+        self._open_files = collections.OrderedDict()
+        self._open_lock = threading.Lock()
+
+        num_columns = set(s[1] for s in self._shapes)
+        if len(num_columns) > 1:
+            raise ValueError("Recordings have different numbers of columns")
+        num_columns = num_columns.pop() if num_columns else 0
+
+        # Columns returned for every window; None selects all of them
+        column_mask = np.ones((num_columns,), dtype=bool)
+        if channels_only:
+            column_mask[[0, 1, -1]] = False
+        if temp_filtered:
+            if num_mags is None:
+                raise ValueError("num_mags is required to filter temperature")
+            if num_columns - 3 == 4 * num_mags:
+                column_mask[2:-1] &= get_temp_mask(num_mags, temp_filtered=True)
+        self._columns = None if np.all(column_mask) else np.flatnonzero(column_mask)
+        self.num_columns = int(np.sum(column_mask))
+
+        num_windows = [
+            max(0, (s[0] - window_size) // stride + 1) for s in self._shapes
+        ]
+        self._offsets = np.concatenate(([0], np.cumsum(num_windows)))
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def _open(self, f):
+        """Returns recording f memory-mapped, closing the least recently used"""
+        with self._open_lock:
+            data = self._open_files.pop(f, None)
+            if data is None:
+                data = np.load(self.paths[f], mmap_mode="r")
+                # Views of a closed recording keep its mapping alive
+                while len(self._open_files) >= max(1, self.max_open_files):
+                    self._open_files.popitem(last=False)
+            self._open_files[f] = data
+        return data
+
+    def _locate(self, idx):
+        """Returns the file index and starting row of window idx"""
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Window index out of range")
+        f = int(np.searchsorted(self._offsets, idx, side="right")) - 1
+        return f, int(idx - self._offsets[f]) * self.stride
+
+    def __getitem__(self, idx):
+        """
+        Returns window idx as a view into the memory-mapped recording.
+        Column selection, if any, makes a copy.
+        """
+        f, start = self._locate(idx)
+        window = self._open(f)[start : start + self.window_size]
+        if self._columns is not None:
+            window = window[:, self._columns]
+        return window
+
+    def _gather(self, indices, out):
+        """Copies windows at indices into out"""
+        for i, idx in enumerate(indices):
+            f, start = self._locate(idx)
+            window = self._open(f)[start : start + self.window_size]
+            if self._columns is None:
+                out[i] = window
+            else:
+                out[i] = window[:, self._columns]
+        return out[: len(indices)]
+
+    def batches(
+        self,
+        batch_size: int,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        seed: int = None,
+        num_prefetch: int = 2,
+        dtype=np.float32,
+    ):
+        """
+        Yields batches of windows of shape (batch_size, window_size, num_columns)
+
+        Batches are gathered into a small pool of reusable buffers on a
+        background thread. A yielded batch is only valid until the next batch
+        is requested; copy it if it must be kept longer.
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of windows in a batch
+        shuffle : bool
+            Windows are visited in random order if true
+        drop_last : bool
+            Last batch is dropped if it has fewer than batch_size windows
+        seed : int
+            Seed for shuffling
+        num_prefetch : int
+            Number of batches prepared ahead of time; at least 1
+        dtype : np.dtype
+            Data type of yielded batches
+        """
+        if num_prefetch < 1:
+            raise ValueError("num_prefetch must be at least 1")
+
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        num_batches = len(order) // batch_size
+        if not drop_last and len(order) % batch_size:
+            num_batches += 1
+
+        buffers = [
+            np.empty((batch_size, self.window_size, self.num_columns), dtype=dtype)
+            for _ in range(num_prefetch + 2)
+        ]
+        batch_queue = queue.Queue(maxsize=num_prefetch)
+        quit_request = threading.Event()
+
+        def put(item):
+            while not quit_request.is_set():
+                try:
+                    batch_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def prefetch():
+            try:
+                for b in range(num_batches):
+                    batch = self._gather(
+                        order[b * batch_size : (b + 1) * batch_size],
+                        buffers[b % len(buffers)],
+                    )
+                    if not put(batch):
+                        return
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=prefetch, daemon=True)
+        thread.start()
+        try:
+            for _ in range(num_batches):
+                batch = batch_queue.get()
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            quit_request.set()
+            thread.join()
@@ -0,0 +1,85 @@
+import ctypes as ct
+import time
+from multiprocessing import Array, Value
+
+
+class StepProfiler:
+    """
+    Accumulates time spent in named steps of a loop. Profiling can be
+    switched on and off at any time, and costs one flag check per step
+    when off.
+
+    Attributes
+    ----------
+    steps: tuple
+        Names of the profiled steps
+    shared: bool
+        Flag indicating if totals should be kept in shared memory, so that
+        they can be read from other processes
+
+    Methods
+    -------
+    enable():
+        Start recording time spent in steps
+    disable():
+        Stop recording time spent in steps
+    reset():
+        Clear recorded times
+    start():
+        Mark the start of the first step
+    lap(step):
+        Mark the end of step, and the start of the next one
+    summary():
+        Return total time and count for every step
+    """
+
+    def __init__(self, steps, shared: bool = False):
+        self.steps = tuple(steps)
+        self._index = {s: i for i, s in enumerate(self.steps)}
+        if shared:
+            self._enabled = Value(ct.c_bool, lock=False)
+            self._totals = Array(ct.c_double, len(self.steps), lock=False)
+            self._counts = Array(ct.c_uint64, len(self.steps), lock=False)
+        else:
+            self._enabled = ct.c_bool()
+            self._totals = (ct.c_double * len(self.steps))()
+            self._counts = (ct.c_uint64 * len(self.steps))()
+        # Start of the current step; None if it was not marked while enabled
+        self._last = None
+
+    @property
+    def enabled(self):
+        return self._enabled.value
+
+    def enable(self):
+        self._enabled.value = True
+
+    def disable(self):
+        self._enabled.value = False
+
+    def reset(self):
+        for i in range(len(self.steps)):
+            self._totals[i] = 0.0
+            self._counts[i] = 0
+
+    def start(self):
+        self._last = time.perf_counter() if self._enabled.value else None
+
+    def lap(self, step):
+        # Steps started before profiling was enabled are skipped
+        if self._enabled.value and self._last is not None:
+            now = time.perf_counter()
+            i = self._index[step]
+            self._totals[i] += now - self._last
+            self._counts[i] += 1
+            self._last = now
+
+    def summary(self):
+        """
+        Returns a dict mapping every step to its total time, in s, and the
+        number of times it was recorded
+        """
+        return {
+            s: {"total": self._totals[i], "count": self._counts[i]}
+            for i, s in enumerate(self.steps)
+        }
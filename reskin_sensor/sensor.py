@@ -5,8 +5,29 @@ import time
 import numpy as np
 import serial
 
+from .profiling import StepProfiler
+
 ReSkinData = collections.namedtuple("ReSkinData", "time, acq_delay, data, dev_id")
 
+# Steps of the decode hot path timed when profiling is enabled
+SENSOR_PROFILE_STEPS = ("wait", "read", "decode", "mask", "package")
+
+
+class ReSkinStallError(serial.SerialException):
+    """Raised when no complete sample arrives from the sensor within timeout"""
+
+
+def get_temp_mask(num_mags, temp_filtered=True):
+    """
+    Returns a mask over the 4 * num_mags floats sent by a sensor, in the
+    order [T, Bx, By, Bz] for each magnetometer. Temperature entries are
+    masked out if temp_filtered is True.
+    """
+    temp_mask = np.ones((4 * num_mags,), dtype=bool)
+    if temp_filtered:
+        temp_mask[::4] = False
+    return temp_mask
+
 
 class ReSkinBase(serial.Serial):
     """
@@ -35,6 +56,14 @@ class ReSkinBase(serial.Serial):
     -------
     get_data(num_samples)
         Collects num_samples samples from sensor
+    reconnect()
+        Closes and reopens the serial port
+    enable_profiling()
+        Start timing steps of the decode hot path
+    disable_profiling()
+        Stop timing steps of the decode hot path
+    get_profile()
+        Return cumulative time and count for every step
     """
 
     def __init__(
@@ -59,9 +88,10 @@ class ReSkinBase(serial.Serial):
         self._msg_floats = 4 * num_mags
         self._msg_length = 4 * self._msg_floats + 2
 
-        self._temp_mask = np.ones((self._msg_floats,), dtype=bool)
-        if temp_filtered:
-            self._temp_mask[::4] = False
+        self._temp_mask = get_temp_mask(num_mags, temp_filtered)
+        self._frame = struct.Struct("@{}fcc".format(self._msg_floats))
+
+        self.profiler = StepProfiler(SENSOR_PROFILE_STEPS)
 
         super(ReSkinBase, self).__init__(port=port, baudrate=baudrate)
         self._initialize()
@@ -78,6 +108,33 @@ class ReSkinBase(serial.Serial):
         except:
             print("Initialization failed. Please disconnect and reconnect sensor.")
 
+    def reconnect(self):
+        """
+        Closes and reopens the serial port, discarding any stale input
+        """
+        self.close()
+        self.open()
+        self.reset_input_buffer()
+
+    def enable_profiling(self):
+        """Start timing steps of the decode hot path"""
+        self.profiler.enable()
+
+    def disable_profiling(self):
+        """Stop timing steps of the decode hot path"""
+        self.profiler.disable()
+
+    def reset_profile(self):
+        """Clear recorded step times"""
+        self.profiler.reset()
+
+    def get_profile(self):
+        """
+        Return a dict mapping every step in SENSOR_PROFILE_STEPS to its
+        cumulative time, in s, and count
+        """
+        return self.profiler.summary()
+
     def get_data(self, num_samples):
         """
         Collects requisite number of samples from the sensor
@@ -105,15 +162,24 @@ class ReSkinBase(serial.Serial):
                         ([t], [acqd], sample, [self.device_id])
                     )
                 )
+            self.profiler.lap("package")
 
         return data
 
-    def get_sample(self, num_samples=1):
+    def get_sample(self, num_samples=1, timeout=None):
         """
         Collects requisite bytes of data from the serial communication
         channel
 
+        Parameters
+        ----------
+        timeout: float
+            Time to wait for a complete sample before raising
+            ReSkinStallError. Waits indefinitely if None.
         """
+        deadline = None if timeout is None else time.time() + timeout
+        self.profiler.start()
+
         # Just to make sure we're not reading in gibberish. Filling up the input
         # buffer causes serial read to give out stale data. Resetting input buffer
         # can occasionally result gibberish coming in. Must ensure that that does
@@ -127,31 +193,36 @@ class ReSkinBase(serial.Serial):
                     if self.read(self._msg_length)[-2:] == b"\r\n":
                         break
                     self.reset_input_buffer()
+                elif deadline is not None and time.time() > deadline:
+                    raise ReSkinStallError("No data from sensor in {} s".format(timeout))
 
         while True:
             if self.in_waiting > self._msg_length:
                 collect_start = time.time()
+                self.profiler.lap("wait")
                 if self.burst_mode:
                     zero_bytes = self.read(self._msg_length)
+                    self.profiler.lap("read")
                     if zero_bytes[-2:] != b"\r\n":
                         zero_bytes = self.read_until(b"\r\n")
                         continue
-                    decoded_zero_bytes = struct.unpack(
-                        "@{}fcc".format(self._msg_floats), zero_bytes
-                    )[: self._msg_floats]
+                    decoded_zero_bytes = self._frame.unpack(zero_bytes)[: self._msg_floats]
 
                 else:
                     zero_bytes = self.readline()
+                    self.profiler.lap("read")
                     decoded_zero_bytes = zero_bytes.decode("utf-8")
                     decoded_zero_bytes = decoded_zero_bytes.strip()
                     decoded_zero_bytes = [float(x) for x in decoded_zero_bytes.split()]
+                self.profiler.lap("decode")
 
                 acq_delay = time.time() - collect_start
-                return collect_start, acq_delay, np.array(decoded_zero_bytes)[self._temp_mask]
+                sample = np.array(decoded_zero_bytes)[self._temp_mask]
+                self.profiler.lap("mask")
+                return collect_start, acq_delay, sample
 
-            else:
-                # Need checks to timeout if required
-                pass
+            elif deadline is not None and time.time() > deadline:
+                raise ReSkinStallError("No data from sensor in {} s".format(timeout))
 
 
 class ReSkinDummy(ReSkinBase):
@@ -176,16 +247,22 @@ class ReSkinDummy(ReSkinBase):
         self._msg_floats = 4 * num_mags
         self._msg_length = 4 * self._msg_floats + 2
 
-        self._temp_mask = np.ones((self._msg_floats,), dtype=bool)
-        if temp_filtered:
-            self._temp_mask[::4] = False
+        self._temp_mask = get_temp_mask(num_mags, temp_filtered)
+        self._frame = struct.Struct("@{}fcc".format(self._msg_floats))
+
+        self.profiler = StepProfiler(SENSOR_PROFILE_STEPS)
 
     def _initialize(self):
         pass
 
-    def get_sample(self, num_samples=1):
+    def reconnect(self):
+        pass
+
+    def get_sample(self, num_samples=1, timeout=None):
+        self.profiler.start()
         collect_start = time.time()
         data = np.random.uniform(-1., 1., size=(np.sum(self._temp_mask),))
+        self.profiler.lap("decode")
         acq_delay = time.time() - collect_start
 
         return collect_start, acq_delay, data
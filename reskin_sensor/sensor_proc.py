@@ -1,12 +1,36 @@
 import atexit
 import ctypes as ct
+import os
 import sys
-from multiprocessing import Process, Event, Pipe, Value, Array
+import time
+from multiprocessing import Process, Event, Lock, Pipe, Value, Array
 
 import numpy as np
 import serial
 
-from .sensor import ReSkinBase, ReSkinData, ReSkinDummy
+from .buffer import ReSkinBuffer, SpillBuffer, load_spilled, spill_chunk
+from .profiling import StepProfiler
+from .sensor import SENSOR_PROFILE_STEPS, ReSkinBase, ReSkinData, ReSkinDummy
+from .sensor_raw import ReSkinRaw
+
+
+# Steps of the streaming loop timed when profiling is enabled, in addition
+# to SENSOR_PROFILE_STEPS
+PROCESS_PROFILE_STEPS = ("publish", "buffer", "send")
+
+
+class _Subscription:
+    """Recording windows and read cursor of a named subscriber"""
+
+    def __init__(self, cursor):
+        # Index of the next unread sample in the shared store
+        self.cursor = cursor
+        # [start_time, stop_time] pairs; stop_time is None while recording
+        self.windows = []
+
+    @property
+    def is_recording(self):
+        return len(self.windows) > 0 and self.windows[-1][1] is None
 
 
 class ReSkinProcess(Process):
@@ -36,6 +60,33 @@ class ReSkinProcess(Process):
         configurations is unavailable
     chunk_size : int
         Quantum of data piped from buffer at one time.
+    raw_transport : bool
+        Flag to read the sensor through ReSkinRaw, directly from the tty,
+        instead of through pyserial
+    buffer_mem_limit : int
+        Maximum memory, in bytes, used to hold buffered samples, and again to
+        hold samples recorded for subscribers. Older samples beyond it are
+        spilled to temporary files. If set, get_buffer and read_subscription
+        return a ReSkinBuffer instead of a list, whether or not anything was
+        spilled. Unlimited if None
+    spill_dir : str
+        Directory for spill files; system default if None
+    sample_period : float
+        Expected time between samples, in s. Estimated from incoming data
+        if None
+    stall_factor : float
+        Sensor is considered stalled if no sample arrives within
+        stall_factor sample periods
+    min_stall_timeout : float
+        Lower limit on the time without samples after which the sensor is
+        considered stalled, in s, so that samples arriving in bursts are not
+        mistaken for a stall
+    reconnect_delay : float
+        Delay before the second attempt to reopen the port after a stall or
+        I/O error, in s; the first attempt is immediate. Doubles after every
+        attempt that does not bring data back
+    max_reconnect_delay : float
+        Upper limit on the delay between reconnection attempts, in s
 
     Methods
     -------
@@ -51,6 +102,28 @@ class ReSkinProcess(Process):
         Return a specified number of samples from the ReSkin Sensor
     get_buffer(timeout=1.0, pause_if_buffering=False):
         Return the recorded buffer
+    subscribe(name):
+        Register a named subscriber with its own recording windows
+    unsubscribe(name):
+        Remove a named subscriber
+    start_recording(name, overwrite=False):
+        Start recording ReSkin data for a subscriber
+    pause_recording(name):
+        Stop recording ReSkin data for a subscriber
+    read_subscription(name, timeout=1.0):
+        Return data recorded for a subscriber since its last read
+    enable_profiling():
+        Start timing steps of the streaming loop
+    disable_profiling():
+        Stop timing steps of the streaming loop
+    get_profile():
+        Return cumulative time and count for every step
+
+    If the sensor stalls or the serial link fails, the port is reopened
+    without restarting the process. Buffers and sample counts are kept, and
+    a single gap marker per outage, i.e. a sample whose acq_delay and data are
+    NaN, is added to the buffer if buffering. Buffers can still be read while
+    the sensor is down.
     """
 
     def __init__(
@@ -64,6 +137,14 @@ class ReSkinProcess(Process):
         reskin_data_struct: bool = True,
         allow_dummy_sensor: bool = False,
         chunk_size: int = 10000,
+        raw_transport: bool = False,
+        buffer_mem_limit: int = None,
+        spill_dir: str = None,
+        sample_period: float = None,
+        stall_factor: float = 10.0,
+        reconnect_delay: float = 0.01,
+        max_reconnect_delay: float = 1.0,
+        min_stall_timeout: float = 0.1,
     ):
         """Initializes a ReSkinProcess object."""
         super(ReSkinProcess, self).__init__()
@@ -75,9 +156,18 @@ class ReSkinProcess(Process):
         self.temp_filtered = temp_filtered
         self.reskin_data_struct = reskin_data_struct
         self.allow_dummy_sensor = allow_dummy_sensor
+        self.raw_transport = raw_transport
+        self.buffer_mem_limit = buffer_mem_limit
+        self.spill_dir = spill_dir
+        self.sample_period = sample_period
+        self.stall_factor = stall_factor
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.min_stall_timeout = min_stall_timeout
 
         self._pipe_in, self._pipe_out = Pipe()
         self._sample_cnt = Value(ct.c_uint64)
+        self._reconnect_cnt = Value(ct.c_uint64)
         self._buffer_size = Value(ct.c_uint64)
 
         self._last_time = Value(ct.c_double)
@@ -92,6 +182,26 @@ class ReSkinProcess(Process):
 
         self._event_is_buffering = Event()
 
+        # Samples for subscribers are kept once, in a store shared by all of
+        # them, and are piped over from the process on request. Requests are
+        # numbered, and every reply carries the number of the request it
+        # answers
+        self._sub_pipe_in, self._sub_pipe_out = Pipe()
+        self._event_is_subscribed = Event()
+        self._sub_request = Value(ct.c_uint64)
+        self._sub_lock = Lock()
+        self._subscriptions = {}
+        # Segments of the store, oldest first. Segments are lists of samples,
+        # or arrays of rows if buffer_mem_limit is set
+        self._store = []
+        self._store_start = 0
+        self._store_end = 0
+        self._store_mem = 0
+
+        # Shared with the process, so that profiles can be read from here
+        self._sensor_profiler = StepProfiler(SENSOR_PROFILE_STEPS, shared=True)
+        self._profiler = StepProfiler(PROCESS_PROFILE_STEPS, shared=True)
+
         atexit.register(self.join)
 
     @property
@@ -112,12 +222,60 @@ class ReSkinProcess(Process):
                     [self.device_id],
                 )
             )
-        # return self._last_reading
 
     @property
     def sample_cnt(self):
         return self._sample_cnt.value
 
+    @property
+    def reconnect_cnt(self):
+        return self._reconnect_cnt.value
+
+    def _gap_marker(self, t):
+        """
+        Sample marking a gap in the data stream, in the same format as
+        last_reading, i.e. ReSkinData or a row [time, acq_delay, data..., dev_id]
+        """
+        nan = float("nan")
+        if self.reskin_data_struct:
+            return ReSkinData(
+                time=t,
+                acq_delay=nan,
+                data=[nan] * len(self._last_reading),
+                dev_id=self.device_id,
+            )
+        row = np.full((len(self._last_reading) + 3,), nan)
+        row[0] = t
+        row[-1] = self.device_id
+        return row
+
+    def _send_buffer(self, buffer):
+        """Pipe the buffer to the reader, emptying it, followed by None"""
+        self._event_sending_data.set()
+        self._profiler.start()
+        if isinstance(buffer, SpillBuffer):
+            for msg in buffer.drain():
+                self._pipe_out.send(msg)
+                self._buffer_size.value = len(buffer)
+                self._profiler.lap("send")
+            self._pipe_out.send(None)
+            return
+
+        chk = self._chunk_size
+        while len(buffer) > 0:
+            if chk > len(buffer):
+                chk = len(buffer)
+            self._pipe_out.send(buffer[0:chk])
+            buffer[0:chk] = []
+            self._buffer_size.value = len(buffer)
+            self._profiler.lap("send")
+        self._pipe_out.send(None)
+
+    def _reconnect(self):
+        """Reopen the sensor port"""
+        self.sensor.reconnect()
+        self._reconnect_cnt.value += 1
+
     def start_streaming(self):
         """Start streaming data from ReSkin sensor"""
         if not self._event_quit_request.is_set():
@@ -205,28 +363,298 @@ class ReSkinProcess(Process):
             else:
                 self._event_is_buffering.clear()
         rtn = []
-        if self._event_sending_data.is_set() or self._buffer_size.value > 0:
-            self._event_sending_data.wait(timeout=timeout)
-            while self._pipe_in.poll() or self._buffer_size.value > 0:
-                rtn.extend(self._pipe_in.recv())
+        if (
+            self._event_sending_data.is_set()
+            or self._buffer_size.value > 0
+            or self._pipe_in.poll()
+        ):
+            # Every transfer ends with None, so the buffer size, which is
+            # updated after each chunk is sent, is not needed to know when to
+            # stop reading
+            is_receiving = self._pipe_in.poll(timeout)
+            while is_receiving:
+                msg = self._pipe_in.recv()
+                if msg is None:
+                    is_receiving = self._pipe_in.poll()
+                    continue
+                if isinstance(msg, list):
+                    rtn.extend(msg)
+                    continue
+                # Chunks from a memory-limited buffer
+                if not isinstance(rtn, ReSkinBuffer):
+                    rtn = ReSkinBuffer(self.reskin_data_struct)
+                if isinstance(msg, tuple):
+                    rtn.add_spilled(*msg)
+                else:
+                    rtn.add_chunk(msg)
             self._event_sending_data.clear()
 
         return rtn
 
+    def enable_profiling(self):
+        """Start timing steps of the streaming loop"""
+        self._sensor_profiler.enable()
+        self._profiler.enable()
+
+    def disable_profiling(self):
+        """Stop timing steps of the streaming loop"""
+        self._sensor_profiler.disable()
+        self._profiler.disable()
+
+    def reset_profile(self):
+        """Clear recorded step times"""
+        self._sensor_profiler.reset()
+        self._profiler.reset()
+
+    def get_profile(self):
+        """
+        Return a dict mapping every step in SENSOR_PROFILE_STEPS and
+        PROCESS_PROFILE_STEPS to its cumulative time, in s, and count
+        """
+        profile = self._sensor_profiler.summary()
+        profile.update(self._profiler.summary())
+        return profile
+
+    def subscribe(self, name):
+        """
+        Register a named subscriber. Each subscriber has its own recording
+        windows and read cursor over data shared by all subscribers
+
+        Parameters
+        ----------
+        name : str
+            Name of the subscriber
+        """
+        with self._sub_lock:
+            if name in self._subscriptions:
+                print("Warning: {} is already subscribed".format(name))
+                return
+            self._subscriptions[name] = _Subscription(self._store_end)
+
+    def unsubscribe(self, name):
+        """Remove a named subscriber, discarding its unread data"""
+        with self._sub_lock:
+            self._subscriptions.pop(name, None)
+            self._update_subscribed()
+            self._trim_store()
+
+    def start_recording(self, name, overwrite: bool = False):
+        """
+        Start recording ReSkin data for a subscriber. Call is ignored if
+        already recording
+
+        Parameters
+        ----------
+        name : str
+            Name of the subscriber
+        overwrite : bool
+            Unread data for the subscriber is discarded if true; kept if false.
+            Ignored if already recording
+        """
+        with self._sub_lock:
+            sub = self._subscriptions[name]
+            if sub.is_recording:
+                print("Warning: {} is already recording".format(name))
+                return
+            if overwrite:
+                self._pull_store()
+                sub.windows = []
+            if len(sub.windows) == 0:
+                sub.cursor = self._store_end
+            sub.windows.append([time.time(), None])
+            self._event_is_subscribed.set()
+
+    def pause_recording(self, name):
+        """Stop recording ReSkin data for a subscriber"""
+        with self._sub_lock:
+            sub = self._subscriptions[name]
+            if sub.is_recording:
+                sub.windows[-1][1] = time.time()
+                self._update_subscribed()
+
+    def read_subscription(self, name, timeout: float = 1.0):
+        """
+        Return data recorded for a subscriber since its last read, as a
+        list, or as a ReSkinBuffer if buffer_mem_limit is set
+
+        Parameters
+        ----------
+        name : str
+            Name of the subscriber
+        timeout : float
+            Time to wait for the process to pipe over new data
+        """
+        with self._sub_lock:
+            sub = self._subscriptions[name]
+            is_complete = self._pull_store(timeout)
+
+            if self.buffer_mem_limit is None:
+                rtn = []
+            else:
+                rtn = ReSkinBuffer(self.reskin_data_struct)
+            offset = self._store_start
+            for samples in self._store:
+                lo = max(sub.cursor - offset, 0)
+                offset += len(samples)
+                for start, stop in sub.windows:
+                    if lo >= len(samples):
+                        break
+                    lo = self._search_time(samples, start, lo)
+                    hi = len(samples)
+                    if stop is not None:
+                        hi = self._search_time(samples, stop, lo)
+                    if hi > lo:
+                        if isinstance(samples, list):
+                            rtn.extend(samples[lo:hi])
+                        else:
+                            rtn.add_chunk(samples[lo:hi])
+                        lo = hi
+
+            sub.cursor = self._store_end
+            if is_complete:
+                # Data up to now has been pulled, so closed windows are complete.
+                # Otherwise they are kept for data that arrives late
+                sub.windows = [w for w in sub.windows if w[1] is None]
+            self._trim_store()
+
+        return rtn
+
+    def _update_subscribed(self):
+        if any(s.is_recording for s in self._subscriptions.values()):
+            self._event_is_subscribed.set()
+        else:
+            self._event_is_subscribed.clear()
+
+    def _pull_store(self, timeout: float = 1.0):
+        """
+        Move data recorded for subscribers from the process to the store.
+        Returns True if all data recorded up to now has been moved, and False
+        if the process did not reply in time
+        """
+        if not self.is_alive():
+            # Nothing more will be sent; keep replies that arrived late
+            while self._sub_pipe_in.poll():
+                self._add_to_store(self._sub_pipe_in.recv()[1])
+            return True
+
+        with self._sub_request.get_lock():
+            self._sub_request.value += 1
+            request = self._sub_request.value
+        deadline = time.time() + timeout
+        while self._sub_pipe_in.poll(max(deadline - time.time(), 0)):
+            reply, parts = self._sub_pipe_in.recv()
+            # Replies to earlier requests that timed out still hold new data
+            self._add_to_store(parts)
+            if reply == request:
+                return True
+        return False
+
+    def _search_time(self, samples, t, lo=0):
+        """
+        Returns the index of the first sample at or after time t in a store
+        segment, searching from lo. Memory-mapped segments are searched in
+        place, so that only the rows visited are read
+        """
+        hi = len(samples)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if isinstance(samples, list):
+                s = samples[mid]
+                mid_time = s.time if self.reskin_data_struct else s[0]
+            else:
+                mid_time = samples[mid, 0]
+            if mid_time < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _add_to_store(self, parts):
+        """
+        Append data piped over from the process to the store. Once more than
+        buffer_mem_limit bytes of it are in memory, the oldest segments are
+        moved to spill files
+        """
+        for part in parts:
+            if isinstance(part, tuple):
+                part = load_spilled(*part)
+            if part is None or len(part) == 0:
+                continue
+            if not isinstance(part, (list, np.memmap)):
+                self._store_mem += part.nbytes
+            self._store.append(part)
+            self._store_end += len(part)
+
+        if self.buffer_mem_limit is None:
+            return
+        for i, samples in enumerate(self._store):
+            if self._store_mem <= self.buffer_mem_limit:
+                break
+            if not isinstance(samples, np.memmap):
+                self._store[i] = spill_chunk(samples, self.spill_dir)
+                self._store_mem -= samples.nbytes
+
+    def _trim_store(self):
+        """Drop data that has been read by all subscribers"""
+        read_up_to = min(
+            [s.cursor for s in self._subscriptions.values() if len(s.windows) > 0]
+            + [self._store_end]
+        )
+        # Segments are dropped once they have been read entirely
+        while len(self._store) > 0:
+            samples = self._store[0]
+            if self._store_start + len(samples) > read_up_to:
+                break
+            self._store.pop(0)
+            self._store_start += len(samples)
+            if not isinstance(samples, (list, np.memmap)):
+                self._store_mem -= samples.nbytes
+
     def join(self, timeout=None):
         """Clean up before exiting"""
         self._event_quit_request.set()
         self.pause_buffering()
         self.pause_streaming()
 
-        super(ReSkinProcess, self).join(timeout)
+        # Keep the pipes empty, so that the process never blocks on a send
+        # while quitting
+        deadline = None if timeout is None else time.time() + timeout
+        while self.is_alive() and (deadline is None or time.time() < deadline):
+            self._discard_pipes()
+            super(ReSkinProcess, self).join(0.01)
+        self._discard_pipes()
+        super(ReSkinProcess, self).join(0)
+
+    def _discard_pipes(self):
+        """Drop data waiting in the pipes, deleting the spill files it names"""
+        while self._pipe_in.poll():
+            self._discard_parts([self._pipe_in.recv()])
+        while self._sub_pipe_in.poll():
+            self._discard_parts(self._sub_pipe_in.recv()[1])
+
+    def _discard_parts(self, parts):
+        for part in parts:
+            if isinstance(part, tuple):
+                try:
+                    os.unlink(part[0])
+                except OSError:
+                    pass
 
     def run(self):
         """This loop runs until it's asked to quit."""
-        buffer = []
+        if self.buffer_mem_limit is None:
+            buffer = []
+        else:
+            buffer = SpillBuffer(
+                num_columns=len(self._last_reading) + 3,
+                chunk_size=self._chunk_size,
+                mem_limit=self.buffer_mem_limit,
+                spill_dir=self.spill_dir,
+            )
         # Initialize sensor
         try:
-            self.sensor = ReSkinBase(
+            sensor_class = ReSkinRaw if self.raw_transport else ReSkinBase
+            self.sensor = sensor_class(
                 num_mags=self.num_mags,
                 port=self.port,
                 baudrate=self.baudrate,
@@ -253,48 +681,128 @@ class ReSkinProcess(Process):
                 self.start_streaming()
             else:
                 sys.exit(-1)
-
+        self.sensor.profiler = self._sensor_profiler
+
+        # Expected sample period, used to detect stalls. Unless specified, it
+        # is estimated as the time elapsed over the number of samples received
+        # since streaming started or the sensor came back, once there are
+        # enough of them that bursts average out. Until then, the last
+        # estimate is used, or 1 s if there is none
+        stall_timeout = 1.0
+        if self.sample_period is not None:
+            stall_timeout = max(
+                self.min_stall_timeout, self.stall_factor * self.sample_period
+            )
+        period_start = None
+        period_cnt = 0
+        # While the sensor is down, the port is reopened at next_reconnect,
+        # and the delay before the following attempt doubles until data returns
+        is_down = False
+        next_reconnect = 0.0
+        reconnect_delay = self.reconnect_delay
+        if self.buffer_mem_limit is None:
+            sub_buffer = []
+        else:
+            sub_buffer = SpillBuffer(
+                num_columns=len(self._last_reading) + 3,
+                chunk_size=self._chunk_size,
+                mem_limit=self.buffer_mem_limit,
+                spill_dir=self.spill_dir,
+            )
+        sub_request = 0
         is_streaming = False
-        while not self._event_quit_request.is_set():
-            if self._event_is_streaming.is_set():
-                if not is_streaming:
-                    is_streaming = True
-                    # Any logging or stuff you want to do when streaming has
-                    # just started should go here
-                (
-                    self._last_time.value,
-                    self._last_delay.value,
-                    self._last_reading[:],
-                ) = self.sensor.get_sample()
-
-                self._sample_cnt.value += 1
-
-                if self._event_is_buffering.is_set():
-                    buffer.append(self.last_reading)
-                    self._buffer_size.value = len(buffer)
-                elif self._buffer_size.value > 0:
-                    self._event_sending_data.set()
-                    chk = self._chunk_size
-                    while len(buffer) > 0:
-                        if chk > len(buffer):
-                            chk = len(buffer)
-                        self._pipe_out.send(buffer[0:chk])
-                        buffer[0:chk] = []
-                        self._buffer_size.value = len(buffer)
-
-            else:
-                if is_streaming:
-                    is_streaming = False
-                    # Logging when streaming just stopped
-
-                if self._buffer_size.value > 0:
-                    self._event_sending_data.set()
-                    chk = self._chunk_size
-                    while len(buffer) > 0:
-                        if chk > len(buffer):
-                            chk = len(buffer)
-                        self._pipe_out.send(buffer[0:chk])
-                        buffer[0:chk] = []
-                        self._buffer_size.value = len(buffer)
+        try:
+            while not self._event_quit_request.is_set():
+                if self._sub_request.value != sub_request:
+                    sub_request = self._sub_request.value
+                    if isinstance(sub_buffer, SpillBuffer):
+                        self._sub_pipe_out.send((sub_request, list(sub_buffer.drain())))
+                    else:
+                        self._sub_pipe_out.send((sub_request, [sub_buffer]))
+                        sub_buffer = []
+
+                if self._event_is_streaming.is_set():
+                    if not is_streaming:
+                        is_streaming = True
+                        period_start = None
+                        # Any logging or stuff you want to do when streaming has
+                        # just started should go here
+                    sample = None
+                    if is_down and time.time() < next_reconnect:
+                        # Keep serving buffer requests while waiting to reconnect
+                        time.sleep(0.001)
+                    else:
+                        try:
+                            if is_down:
+                                self._reconnect()
+                            sample = self.sensor.get_sample(timeout=stall_timeout)
+                        except (serial.serialutil.SerialException, OSError) as e:
+                            if not is_down:
+                                is_down = True
+                                print("WARNING: ", e)
+                                if self._event_is_subscribed.is_set():
+                                    sub_buffer.append(self._gap_marker(time.time()))
+                                if self._event_is_buffering.is_set():
+                                    buffer.append(self._gap_marker(time.time()))
+                                    self._buffer_size.value = len(buffer)
+                                reconnect_delay = self.reconnect_delay
+                                next_reconnect = time.time()
+                            else:
+                                next_reconnect = time.time() + reconnect_delay
+                                reconnect_delay = min(
+                                    2 * reconnect_delay, self.max_reconnect_delay
+                                )
+                            period_start = None
+
+                    if sample is not None:
+                        if is_down:
+                            is_down = False
+                            print("Reconnected to sensor")
+                        sample_time, sample_delay, reading = sample
+
+                        if self.sample_period is None:
+                            if period_start is None:
+                                period_start, period_cnt = sample_time, 0
+                            else:
+                                period_cnt += 1
+                            if period_cnt >= 10:
+                                period = (sample_time - period_start) / period_cnt
+                                stall_timeout = max(
+                                    self.min_stall_timeout, self.stall_factor * period
+                                )
+
+                        self._profiler.start()
+                        (
+                            self._last_time.value,
+                            self._last_delay.value,
+                            self._last_reading[:],
+                        ) = (sample_time, sample_delay, reading)
+
+                        self._sample_cnt.value += 1
+                        self._profiler.lap("publish")
+
+                        if self._event_is_subscribed.is_set():
+                            sub_buffer.append(self.last_reading)
+                            self._profiler.lap("buffer")
+
+                        if self._event_is_buffering.is_set():
+                            buffer.append(self.last_reading)
+                            self._buffer_size.value = len(buffer)
+                            self._profiler.lap("buffer")
+
+                else:
+                    if is_streaming:
+                        is_streaming = False
+                        # Logging when streaming just stopped
+
+                is_buffering = self._event_is_buffering.is_set()
+                if not is_buffering and self._buffer_size.value > 0:
+                    self._send_buffer(buffer)
+
+        finally:
+            # Unsent data is discarded along with its spill files
+            for b in (buffer, sub_buffer):
+                if isinstance(b, SpillBuffer):
+                    b.close()
 
         self.pause_streaming()
@@ -0,0 +1,329 @@
+import array
+import os
+import struct
+import time
+
+import numpy as np
+import serial
+
+from .profiling import StepProfiler
+from .sensor import SENSOR_PROFILE_STEPS, ReSkinBase, ReSkinStallError, get_temp_mask
+
+try:
+    import fcntl
+    import termios
+except ImportError:
+    # Not available on Windows; only URL-style ports can be used there
+    fcntl = None
+    termios = None
+
+
+class ReSkinRaw(ReSkinBase):
+    """
+    ReSkin sensor read directly from the tty file descriptor.
+
+    The port is opened and configured with termios instead of pyserial, and
+    data is read in large chunks into a reusable buffer that frames are
+    decoded from in place. This avoids the per-frame pyserial calls made by
+    ReSkinBase. pyserial URL-style ports (e.g. loop://, socket://) are also
+    accepted, and are read through pyserial.
+
+    Of the serial.Serial interface, only is_open, in_waiting, write, flush,
+    reset_input_buffer and close are supported.
+
+    Attributes
+    ----------
+    num_mags: int
+        Number of magnetometers connected to the sensor
+    port : str
+        System port that the sensor is connected to, or a pyserial URL
+    baudrate: int
+        Baudrate at which data is transmitted by sensor
+    burst_mode: bool
+        Flag for whether sensor is using burst mode
+    device_id: int
+        Sensor ID; mostly useful when using multiple sensors simultaneously
+    temp_filtered: bool
+        Flag indicating if temperature readings should be filtered from
+        the output
+    reskin_data_struct: bool
+        Flag indicating whether the ReSkinData structure should be used for
+        output data
+    read_size: int
+        Maximum number of bytes read from the port at a time
+    max_backlog: int
+        Number of bytes still waiting in the port after a full read beyond
+        which the reader is considered to have fallen behind the sensor. All
+        waiting input is then dropped, and reading resumes with fresh data
+    """
+
+    def __init__(
+        self,
+        num_mags: int = 1,
+        port: str = None,
+        baudrate: int = 115200,
+        burst_mode: bool = True,
+        device_id: int = -1,
+        temp_filtered: bool = False,
+        reskin_data_struct: bool = True,
+        read_size: int = 16384,
+        max_backlog: int = 4000,
+    ) -> None:
+        """Initializes a ReSkinRaw object."""
+
+        self.num_mags = num_mags
+        self.port_name = port
+        self.baud_rate = baudrate
+        self.burst_mode = burst_mode
+        self.device_id = device_id
+        self.reskin_data_struct = reskin_data_struct
+        self.read_size = read_size
+        self.max_backlog = max_backlog
+
+        self._msg_floats = 4 * num_mags
+        self._msg_length = 4 * self._msg_floats + 2
+        self._frame = struct.Struct("@{}f".format(self._msg_floats))
+
+        self._temp_mask = get_temp_mask(num_mags, temp_filtered)
+
+        self.profiler = StepProfiler(SENSOR_PROFILE_STEPS)
+
+        # Unparsed bytes are held in _buf[_start:_end]
+        self._buf = bytearray(read_size + self._msg_length)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        # Set when unparsed bytes were dropped mid-line, in non-burst mode
+        self._partial_line = False
+
+        self._fd = None
+        self._url_serial = None
+
+        self.open()
+        self._initialize()
+
+    def _initialize(self):
+        print("Initializing sensor...")
+        try:
+            self.get_sample(timeout=1.0)
+            print("Initialization successful")
+        except:
+            print("Initialization failed. Please disconnect and reconnect sensor.")
+
+    def open(self):
+        """
+        Opens and configures the port
+        """
+        if self.port_name is None:
+            raise serial.SerialException("Port must be configured before it can be used.")
+
+        if "://" in self.port_name:
+            self._url_serial = serial.serial_for_url(
+                self.port_name, baudrate=self.baud_rate, timeout=0.1
+            )
+            return
+
+        if termios is None:
+            raise serial.SerialException("Raw tty access is not supported on this platform")
+        try:
+            self._fd = os.open(self.port_name, os.O_RDWR | os.O_NOCTTY)
+        except OSError as e:
+            raise serial.SerialException(
+                "could not open port {}: {}".format(self.port_name, e)
+            )
+        try:
+            self._configure()
+        except (OSError, termios.error) as e:
+            self.close()
+            raise serial.SerialException(
+                "could not configure port {}: {}".format(self.port_name, e)
+            )
+
+    def _configure(self):
+        """Puts the tty in raw mode, as cfmakeraw does"""
+        speed = getattr(termios, "B{}".format(self.baud_rate), None)
+        if speed is None:
+            raise serial.SerialException("Unsupported baudrate: {}".format(self.baud_rate))
+
+        iflag, oflag, cflag, lflag, _, _, cc = termios.tcgetattr(self._fd)
+        iflag &= ~(
+            termios.IGNBRK | termios.BRKINT | termios.PARMRK | termios.ISTRIP
+            | termios.INLCR | termios.IGNCR | termios.ICRNL | termios.IXON
+            | termios.IXOFF
+        )
+        oflag &= ~termios.OPOST
+        lflag &= ~(
+            termios.ECHO | termios.ECHONL | termios.ICANON | termios.ISIG
+            | termios.IEXTEN
+        )
+        cflag &= ~(termios.CSIZE | termios.PARENB | termios.CSTOPB)
+        cflag |= termios.CS8 | termios.CREAD | termios.CLOCAL
+        # Return as soon as any data is available, or after 0.1 s
+        cc[termios.VMIN] = 0
+        cc[termios.VTIME] = 1
+        termios.tcsetattr(
+            self._fd, termios.TCSANOW, [iflag, oflag, cflag, lflag, speed, speed, cc]
+        )
+        termios.tcflush(self._fd, termios.TCIFLUSH)
+
+        # Ask the driver not to hold back data; only supported on Linux
+        try:
+            serial_info = array.array("i", [0] * 32)
+            fcntl.ioctl(self._fd, termios.TIOCGSERIAL, serial_info)
+            serial_info[4] |= 0x2000  # ASYNC_LOW_LATENCY
+            fcntl.ioctl(self._fd, termios.TIOCSSERIAL, serial_info)
+        except (AttributeError, OSError):
+            pass
+
+    def close(self):
+        """Closes the port"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._url_serial is not None:
+            self._url_serial.close()
+            self._url_serial = None
+
+    @property
+    def is_open(self):
+        return self._fd is not None or self._url_serial is not None
+
+    @property
+    def in_waiting(self):
+        """Number of bytes received but not yet decoded"""
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        return self._end - self._start + self._in_waiting()
+
+    def write(self, data):
+        """Writes data to the port, returning the number of bytes written"""
+        if self._fd is not None:
+            view = memoryview(data)
+            written = 0
+            while written < len(view):
+                written += os.write(self._fd, view[written:])
+            return written
+        if self._url_serial is not None:
+            return self._url_serial.write(data)
+        raise serial.PortNotOpenError()
+
+    def flush(self):
+        """Waits until all written data has been transmitted"""
+        if self._fd is not None:
+            termios.tcdrain(self._fd)
+        elif self._url_serial is not None:
+            self._url_serial.flush()
+        else:
+            raise serial.PortNotOpenError()
+
+    def reconnect(self):
+        """
+        Closes and reopens the port, discarding any stale input
+        """
+        self.close()
+        self.open()
+        self.reset_input_buffer()
+
+    def reset_input_buffer(self):
+        """Discards all unread input"""
+        self._start = self._end = 0
+        if self._fd is not None:
+            termios.tcflush(self._fd, termios.TCIFLUSH)
+        elif self._url_serial is not None:
+            self._url_serial.reset_input_buffer()
+
+    def _in_waiting(self):
+        """Returns the number of bytes waiting in the port, not yet read"""
+        if self._fd is not None:
+            waiting = array.array("i", [0])
+            fcntl.ioctl(self._fd, termios.FIONREAD, waiting)
+            return waiting[0]
+        if self._url_serial is not None:
+            return self._url_serial.in_waiting
+        return 0
+
+    def _fill(self):
+        """Reads available bytes from the port into the buffer"""
+        # Move unparsed bytes to the front to make room
+        pending = self._end - self._start
+        if self._start > 0:
+            self._buf[:pending] = self._view[self._start : self._end]
+            self._start, self._end = 0, pending
+        if self._end == len(self._buf):
+            # Only possible in non-burst mode, with a full buffer and no line
+            # ending. Drop it, along with the rest of the line
+            self._start = self._end = 0
+            self._partial_line = True
+
+        target = self._view[self._end :]
+        if self._fd is not None:
+            n = os.readv(self._fd, [target])
+        elif self._url_serial is not None:
+            waiting = self._url_serial.in_waiting
+            n = self._url_serial.readinto(target[: max(1, min(waiting, len(target)))])
+        else:
+            raise serial.PortNotOpenError()
+        self._end += n
+
+        # Data is only left in the port if the read filled the buffer. If much
+        # more is waiting, data is coming in faster than it is consumed, so
+        # drop the stale data; frames resynchronize on the next line ending
+        if n == len(target) and self._in_waiting() > self.max_backlog:
+            self.reset_input_buffer()
+
+    def _resync(self):
+        """Moves the start of the buffer past the next line ending"""
+        idx = self._buf.find(b"\r\n", self._start, self._end)
+        if idx < 0:
+            self._start = max(self._start, self._end - 1)
+        else:
+            self._start = idx + 2
+
+    def _next_frame(self):
+        """Decodes the next complete frame in the buffer, if any"""
+        if self.burst_mode:
+            while self._end - self._start >= self._msg_length:
+                s = self._start
+                e = s + self._msg_length
+                if self._buf[e - 2] == 13 and self._buf[e - 1] == 10:
+                    self._start = e
+                    return self._frame.unpack_from(self._buf, s)
+                self._resync()
+        else:
+            idx = self._buf.find(b"\n", self._start, self._end)
+            while idx >= 0:
+                line = self._view[self._start : idx].tobytes()
+                self._start = idx + 1
+                if not self._partial_line:
+                    return [float(x) for x in line.decode("utf-8").split()]
+                self._partial_line = False
+                idx = self._buf.find(b"\n", self._start, self._end)
+        return None
+
+    def get_sample(self, num_samples=1, timeout=None):
+        """
+        Decodes the next sample from the data read from the port
+
+        Parameters
+        ----------
+        timeout: float
+            Time to wait for a complete sample before raising
+            ReSkinStallError. Waits indefinitely if None.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        self.profiler.start()
+        while True:
+            collect_start = time.time()
+            decoded_zero_bytes = self._next_frame()
+            self.profiler.lap("decode")
+            if decoded_zero_bytes is not None:
+                acq_delay = time.time() - collect_start
+                sample = np.array(decoded_zero_bytes)[self._temp_mask]
+                self.profiler.lap("mask")
+                return collect_start, acq_delay, sample
+
+            if deadline is not None and collect_start > deadline:
+                raise ReSkinStallError("No data from sensor in {} s".format(timeout))
+            # Reads return as soon as data arrives, so this includes waiting
+            self._fill()
+            self.profiler.lap("read")
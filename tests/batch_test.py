@@ -0,0 +1,84 @@
+import csv
+
+import numpy as np
+import pytest
+
+from reskin_sensor.batch import process_directory, process_recording
+
+NUM_MAGS = 2
+
+
+def _recording(num_samples, contact_spans, period=0.1):
+    """
+    Recording with temperature, in contact during the given [start, stop)
+    sample spans
+    """
+    data = np.zeros((num_samples, 4 * NUM_MAGS + 3))
+    data[:, 0] = np.arange(num_samples) * period
+    data[:, 2:-1:4] = 25.0
+    for start, stop in contact_spans:
+        # Bz of the last magnetometer
+        data[start:stop, -2] = 100.0
+    return data
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 10, 1000])
+def test_contacts_across_chunks(tmp_path, chunk_size):
+    path = str(tmp_path / "rec.npy")
+    np.save(path, _recording(50, [(5, 15), (30, 31), (45, 50)]))
+
+    summary = process_recording(
+        path, NUM_MAGS, baseline_samples=5, chunk_size=chunk_size
+    )
+    assert summary["num_samples"] == 50
+    assert summary["num_contacts"] == 3
+    # The last contact lasts until the end of the recording
+    assert summary["contact_time"] == pytest.approx(1.0 + 0.1 + 0.4)
+    assert summary["max_Bz1"] == pytest.approx(100.0)
+    assert summary["mean_Bz1"] == pytest.approx(100.0 * 16 / 50)
+    assert "mean_T0" not in summary
+
+
+def test_stats_match_whole_recording(tmp_path):
+    rng = np.random.default_rng(0)
+    data = _recording(100, [])
+    data[:, 2:-1] += rng.normal(size=(100, 4 * NUM_MAGS))
+    path = str(tmp_path / "rec.npy")
+    np.save(path, data)
+
+    summary = process_recording(
+        path, NUM_MAGS, steps=("stats",), baseline_samples=10, chunk_size=13
+    )
+    field = data[:, 2:-1][:, [1, 2, 3, 5, 6, 7]]
+    assert summary["mean_Bx0"] == pytest.approx(field[:, 0].mean())
+    assert summary["std_Bz1"] == pytest.approx(field[:, 5].std())
+    assert summary["min_By1"] == pytest.approx(field[:, 4].min())
+    assert "num_contacts" not in summary
+
+
+def test_failed_recordings_are_recorded(tmp_path):
+    np.save(str(tmp_path / "a.npy"), _recording(20, [(2, 4)]))
+    np.save(str(tmp_path / "b.npy"), np.zeros((20, 5)))
+    (tmp_path / "c.npy").write_bytes(b"not a recording")
+    output = str(tmp_path / "summary.csv")
+
+    summaries = process_directory(
+        str(tmp_path), output, num_workers=2, num_mags=NUM_MAGS
+    )
+    assert [s["error"] == "" for s in summaries] == [True, False, False]
+    assert "channels do not match" in summaries[1]["error"]
+
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["path"] for r in rows] == [s["path"] for s in summaries]
+    # Columns with missing values are floats
+    assert float(rows[0]["num_contacts"]) == 1
+    assert rows[1]["num_contacts"] == "nan"
+    assert rows[1]["error"] == summaries[1]["error"]
+
+    npz_output = str(tmp_path / "summary.npz")
+    process_directory(str(tmp_path), npz_output, num_workers=1, num_mags=NUM_MAGS)
+    table = np.load(npz_output)
+    assert table["num_samples"][0] == 20
+    assert np.isnan(table["num_samples"][2])
+    assert table["error"][0] == ""
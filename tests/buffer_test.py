@@ -0,0 +1,133 @@
+import os
+import time
+
+import numpy as np
+
+from reskin_sensor import ReSkinBuffer, ReSkinProcess
+from reskin_sensor.buffer import SpillBuffer, load_spilled, spill_chunk
+from reskin_sensor.sensor import ReSkinData
+
+NUM_COLUMNS = 5
+
+
+def _rows(num_rows, start=0):
+    rows = np.zeros((num_rows, NUM_COLUMNS))
+    rows[:, 0] = np.arange(start, start + num_rows)
+    rows[:, 2:-1] = rows[:, :1] * 10
+    return rows
+
+
+def _drain(buffer):
+    """Reads a drained SpillBuffer back, as get_buffer does"""
+    rtn = ReSkinBuffer(reskin_data_struct=False)
+    for msg in buffer.drain():
+        if isinstance(msg, tuple):
+            rtn.add_spilled(*msg)
+        else:
+            rtn.add_chunk(msg)
+    return rtn
+
+
+def test_spill_and_drain_keep_order(tmp_path):
+    chunk_bytes = 4 * NUM_COLUMNS * 8
+    buffer = SpillBuffer(
+        NUM_COLUMNS, chunk_size=4, mem_limit=2 * chunk_bytes, spill_dir=tmp_path
+    )
+    for row in _rows(23):
+        buffer.append(row)
+    assert len(buffer) == 23
+    # Only two chunks are held in memory; older ones are in the spill file
+    assert len(os.listdir(tmp_path)) == 1
+
+    drained = _drain(buffer)
+    assert len(buffer) == 0
+    assert np.array_equal(drained.to_array(), _rows(23))
+    # The reader deletes the spill file once it is mapped
+    assert os.listdir(tmp_path) == []
+
+
+def test_append_reskin_data():
+    buffer = SpillBuffer(NUM_COLUMNS, chunk_size=4, mem_limit=1 << 20)
+    buffer.append(ReSkinData(time=1.0, acq_delay=0.5, data=[2.0, 3.0], dev_id=7))
+    assert np.array_equal(_drain(buffer).to_array(), [[1.0, 0.5, 2.0, 3.0, 7.0]])
+
+
+def test_close_deletes_spill_file(tmp_path):
+    buffer = SpillBuffer(NUM_COLUMNS, chunk_size=2, mem_limit=0, spill_dir=tmp_path)
+    for row in _rows(10):
+        buffer.append(row)
+    assert len(os.listdir(tmp_path)) == 1
+    buffer.close()
+    assert len(buffer) == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_reskin_buffer_indexing():
+    buffer = ReSkinBuffer(reskin_data_struct=True)
+    buffer.add_chunk(_rows(3))
+    buffer.add_chunk(_rows(0))
+    buffer.add_chunk(_rows(4, start=3))
+    expected = _rows(7)
+
+    assert len(buffer) == 7
+    assert np.array_equal(buffer[2:5], expected[2:5])
+    assert np.array_equal(buffer[::2], expected[::2])
+    assert np.array_equal(np.asarray(buffer), expected)
+    assert buffer[-1].time == 6.0
+    assert buffer[3].dev_id == 0
+    assert np.array_equal(buffer[3].data, expected[3, 2:-1])
+    assert buffer[5:5].shape == (0, NUM_COLUMNS)
+
+
+def test_spill_chunk_is_mapped_and_deleted(tmp_path):
+    rows = spill_chunk(_rows(6), spill_dir=tmp_path)
+    assert isinstance(rows, np.memmap)
+    assert np.array_equal(rows, _rows(6))
+    assert os.listdir(tmp_path) == []
+    assert load_spilled(os.path.join(tmp_path, "missing.bin"), 0, NUM_COLUMNS) is None
+
+
+def test_process_join_deletes_spill_files(tmp_path):
+    sensor = ReSkinProcess(
+        num_mags=5,
+        allow_dummy_sensor=True,
+        temp_filtered=True,
+        chunk_size=100,
+        buffer_mem_limit=10000,
+        spill_dir=str(tmp_path),
+    )
+    sensor.start()
+    time.sleep(0.5)
+    sensor.subscribe("test")
+    sensor.start_recording("test")
+    sensor.start_buffering()
+    time.sleep(0.5)
+    assert len(os.listdir(tmp_path)) > 0
+    # Joined with buffered data that was never read
+    sensor.join()
+    assert os.listdir(tmp_path) == []
+
+
+def test_get_buffer_returns_spilled_data(tmp_path):
+    sensor = ReSkinProcess(
+        num_mags=5,
+        allow_dummy_sensor=True,
+        temp_filtered=True,
+        reskin_data_struct=False,
+        chunk_size=100,
+        buffer_mem_limit=10000,
+        spill_dir=str(tmp_path),
+    )
+    sensor.start()
+    time.sleep(0.5)
+    try:
+        sensor.start_buffering()
+        time.sleep(0.2)
+        buffer = sensor.get_buffer(pause_if_buffering=True)
+        assert isinstance(buffer, ReSkinBuffer)
+        times = np.asarray(buffer)[:, 0]
+        assert len(times) > 100
+        assert np.all(np.diff(times) > 0)
+        assert os.listdir(tmp_path) == []
+    finally:
+        sensor.join()
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from reskin_sensor import ReSkinDataset
+from reskin_sensor.sensor import get_temp_mask
+
+NUM_MAGS = 2
+NUM_COLUMNS = 4 * NUM_MAGS + 3
+
+
+def _save_recordings(tmp_path, lengths):
+    paths = []
+    for i, length in enumerate(lengths):
+        data = np.arange(length * NUM_COLUMNS, dtype=np.float64)
+        data = data.reshape(length, NUM_COLUMNS) + 1000 * i
+        path = str(tmp_path / "rec_{}.npy".format(i))
+        np.save(path, data)
+        paths.append(path)
+    return paths
+
+
+def _windows(paths, window_size, stride):
+    """All windows of the recordings, in order"""
+    windows = []
+    for p in paths:
+        data = np.load(p)
+        for start in range(0, len(data) - window_size + 1, stride):
+            windows.append(data[start : start + window_size])
+    return windows
+
+
+def test_window_indexing(tmp_path):
+    paths = _save_recordings(tmp_path, [10, 3, 7])
+    dataset = ReSkinDataset(paths, window_size=4, stride=2)
+    expected = _windows(paths, 4, 2)
+
+    assert len(dataset) == len(expected) == 4 + 0 + 2
+    for i, window in enumerate(expected):
+        assert np.array_equal(dataset[i], window)
+    assert np.array_equal(dataset[-1], expected[-1])
+    with pytest.raises(IndexError):
+        dataset[len(dataset)]
+
+
+def test_column_selection(tmp_path):
+    paths = _save_recordings(tmp_path, [6])
+    dataset = ReSkinDataset(
+        paths, window_size=3, num_mags=NUM_MAGS, temp_filtered=True, channels_only=True
+    )
+    columns = 2 + np.flatnonzero(get_temp_mask(NUM_MAGS, temp_filtered=True))
+    assert dataset.num_columns == 3 * NUM_MAGS
+    assert np.array_equal(dataset[1], np.load(paths[0])[1:4, columns])
+
+    batch = next(dataset.batches(2, shuffle=False))
+    assert batch.dtype == np.float32
+    assert np.array_equal(batch[1], np.load(paths[0])[1:4, columns])
+
+
+def test_open_files_are_bounded(tmp_path):
+    paths = _save_recordings(tmp_path, [5] * 6)
+    dataset = ReSkinDataset(paths, window_size=5, max_open_files=2)
+    assert len(dataset._open_files) == 0
+
+    windows = [dataset[i] for i in range(len(dataset))]
+    assert len(dataset._open_files) == 2
+    # Windows of closed recordings stay readable
+    for window, expected in zip(windows, _windows(paths, 5, 1)):
+        assert np.array_equal(window, expected)
+
+
+def test_batches_cover_every_window_once(tmp_path):
+    paths = _save_recordings(tmp_path, [20, 13])
+    dataset = ReSkinDataset(paths, window_size=4, stride=3)
+    expected = np.array(_windows(paths, 4, 3))
+
+    batches = [b.copy() for b in dataset.batches(3, seed=0, dtype=np.float64)]
+    assert [len(b) for b in batches] == [3] * (len(expected) // 3) + [len(expected) % 3]
+    seen = np.concatenate(batches)
+    order = np.lexsort(seen[:, 0, ::-1].T)
+    assert np.array_equal(seen[order], expected)
+
+    dropped = list(dataset.batches(3, seed=0, drop_last=True))
+    assert len(dropped) == len(expected) // 3
+
+
+def test_yielded_batch_is_not_overwritten(tmp_path):
+    paths = _save_recordings(tmp_path, [200])
+    dataset = ReSkinDataset(paths, window_size=5)
+    expected = np.array(_windows(paths, 5, 1))
+
+    for b, batch in enumerate(
+        dataset.batches(8, shuffle=False, num_prefetch=1, dtype=np.float64)
+    ):
+        # Give the prefetch thread time to run as far ahead as it can
+        time.sleep(0.005)
+        assert np.array_equal(batch, expected[8 * b : 8 * (b + 1)])
+
+
+def test_early_exit_stops_prefetch(tmp_path):
+    paths = _save_recordings(tmp_path, [200])
+    dataset = ReSkinDataset(paths, window_size=5)
+    num_threads = threading.active_count()
+    batches = dataset.batches(4)
+    next(batches)
+    batches.close()
+    assert threading.active_count() == num_threads
+
+
+def test_num_prefetch_must_be_positive(tmp_path):
+    dataset = ReSkinDataset(_save_recordings(tmp_path, [10]), window_size=2)
+    with pytest.raises(ValueError):
+        next(dataset.batches(4, num_prefetch=0))
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from reskin_sensor import ReSkinProcess
+
+pytest.importorskip("matplotlib")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "visualizations"))
+from heatmap import BufferFetcher, RollingWindow, minmax_decimate  # noqa: E402
+
+
+def test_rolling_window_matches_latest_samples():
+    rng = np.random.default_rng(0)
+    window = RollingWindow(size=10, num_channels=3, dtype=np.float64)
+    samples = np.zeros((10, 3))
+    for num_new in [3, 0, 7, 1, 12, 9, 10, 4]:
+        new = rng.normal(size=(num_new, 3))
+        window.extend(new)
+        samples = np.concatenate((samples, new))[-10:]
+        view = window.view()
+        assert view.shape == (3, 10)
+        assert np.array_equal(view, samples.T)
+
+
+def test_rolling_window_view_is_not_a_copy():
+    window = RollingWindow(size=4, num_channels=2)
+    window.extend(np.ones((2, 2)))
+    assert np.shares_memory(window.view(), window._data)
+
+
+def test_minmax_decimate_keeps_extremes():
+    rng = np.random.default_rng(0)
+    window = rng.normal(size=(3, 100))
+    window[1, 37] = 50.0
+
+    frame = minmax_decimate(window, 10)
+    assert frame.shape == (3, 20)
+    bins = window.reshape(3, 10, 10)
+    assert np.array_equal(frame[:, 0::2], bins.min(axis=-1))
+    assert np.array_equal(frame[:, 1::2], bins.max(axis=-1))
+    assert frame[1].max() == 50.0
+
+    # Output buffer of the right shape is reused
+    assert minmax_decimate(window, 10, out=frame) is frame
+    # Nothing to decimate
+    assert minmax_decimate(window, 100) is window
+
+
+def test_fetcher_fills_window_from_subscription():
+    sensor = ReSkinProcess(
+        num_mags=5,
+        allow_dummy_sensor=True,
+        temp_filtered=True,
+        reskin_data_struct=False,
+    )
+    sensor.start()
+    time.sleep(0.5)
+    try:
+        window = RollingWindow(size=1000000, num_channels=15)
+        fetcher = BufferFetcher(sensor, window, np.zeros((1, 15)), threading.Lock())
+        fetcher.start()
+        time.sleep(0.5)
+        fetcher.stop()
+        fetcher.join()
+
+        num_fetched = window._head
+        assert num_fetched > 100
+        # The dummy sensor draws data from (-1, 1), so no fetched sample is zero
+        assert np.all(window.view()[:, -num_fetched:] != 0)
+        assert sensor._subscriptions == {}
+    finally:
+        sensor.join()
@@ -0,0 +1,53 @@
+import os
+import struct
+import threading
+import time
+
+import pytest
+
+from reskin_sensor import ReSkinProcess
+
+tty = pytest.importorskip("tty")
+
+NUM_MAGS = 5
+
+
+def _feed(fd, stop, period=0.01, frames_per_write=2):
+    """Streams frames at 1 / period Hz, a few frames per write"""
+    frame = struct.Struct("@{}fcc".format(4 * NUM_MAGS))
+    i = 0
+    while not stop.is_set():
+        data = b"".join(
+            frame.pack(*([float(i + j)] * 4 * NUM_MAGS), b"\r", b"\n")
+            for j in range(frames_per_write)
+        )
+        os.write(fd, data)
+        i += frames_per_write
+        time.sleep(period * frames_per_write)
+
+
+def test_bursty_stream_is_not_mistaken_for_a_stall():
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    stop = threading.Event()
+    feeder = threading.Thread(target=_feed, args=(master, stop), daemon=True)
+    feeder.start()
+
+    sensor = ReSkinProcess(num_mags=NUM_MAGS, port=os.ttyname(slave))
+    sensor.start()
+    try:
+        # Let the stall timeout settle on an estimate of the sample period
+        time.sleep(1.5)
+        sample_cnt = sensor.sample_cnt
+        reconnect_cnt = sensor.reconnect_cnt
+        time.sleep(1.0)
+
+        # 100 Hz stream, with some slack for a loaded machine
+        assert sensor.sample_cnt - sample_cnt > 50
+        assert sensor.reconnect_cnt == reconnect_cnt
+    finally:
+        stop.set()
+        feeder.join(timeout=1.0)
+        sensor.join()
+        os.close(master)
+        os.close(slave)
@@ -0,0 +1,84 @@
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from reskin_sensor import ReSkinRaw
+
+NUM_MAGS = 5
+
+
+def _frames(values):
+    frame = struct.Struct("@{}fcc".format(4 * NUM_MAGS))
+    return b"".join(frame.pack(*([float(v)] * 4 * NUM_MAGS), b"\r", b"\n") for v in values)
+
+
+def _read_all(sensor, timeout=0.2):
+    """Returns the first channel of every sample until the stream stalls"""
+    values = []
+    while True:
+        try:
+            values.append(sensor.get_sample(timeout=timeout)[2][0])
+        except Exception:
+            return values
+
+
+def test_loop_port_round_trip():
+    sensor = ReSkinRaw(num_mags=NUM_MAGS, port="loop://")
+    assert sensor.is_open
+    assert sensor.in_waiting == 0
+
+    data = _frames(range(10))
+    assert sensor.write(data) == len(data)
+    sensor.flush()
+    assert sensor.in_waiting == len(data)
+
+    t, acq_delay, sample = sensor.get_sample(timeout=1.0)
+    assert sample.shape == (4 * NUM_MAGS,)
+    assert np.all(sample == 0.0)
+    assert sensor.in_waiting == len(data) - sensor._msg_length
+    assert _read_all(sensor) == list(range(1, 10))
+
+    sensor.close()
+    assert not sensor.is_open
+
+
+def test_temp_filtered_loop_port():
+    sensor = ReSkinRaw(num_mags=NUM_MAGS, port="loop://", temp_filtered=True)
+    sensor.write(_frames([7]))
+    assert sensor.get_sample(timeout=1.0)[2].shape == (3 * NUM_MAGS,)
+    sensor.close()
+
+
+def test_large_read_keeps_all_frames():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    accepted = []
+    acceptor = threading.Thread(target=lambda: accepted.append(server.accept()[0]))
+    acceptor.start()
+    sensor = ReSkinRaw(
+        num_mags=NUM_MAGS, port="socket://127.0.0.1:{}".format(server.getsockname()[1])
+    )
+    acceptor.join()
+
+    # Well over 4000 bytes, sent at once so that they are read in one call
+    accepted[0].sendall(_frames(range(100)))
+    time.sleep(0.2)
+    assert _read_all(sensor) == list(range(100))
+
+    sensor.close()
+    accepted[0].close()
+    server.close()
+
+
+def test_overlong_line_is_dropped():
+    sensor = ReSkinRaw(num_mags=1, port="loop://", burst_mode=False, read_size=64)
+    sensor.write(b"x" * 200 + b"\n" + b"1.0 2.0 3.0 4.0\n")
+    start = time.time()
+    sample = sensor.get_sample(timeout=1.0)[2]
+    assert list(sample) == [1.0, 2.0, 3.0, 4.0]
+    assert time.time() - start < 0.5
+    sensor.close()
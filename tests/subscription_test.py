@@ -0,0 +1,156 @@
+import atexit
+import os
+import time
+
+import numpy as np
+
+from reskin_sensor import ReSkinBuffer, ReSkinProcess
+
+
+def make_sensor(**kwargs):
+    """
+    Unstarted ReSkinProcess whose subscription replies are sent by the test
+    instead of a running process
+    """
+    sensor = ReSkinProcess(num_mags=1, reskin_data_struct=False, **kwargs)
+    sensor.is_alive = lambda: True
+    atexit.unregister(sensor.join)
+    return sensor
+
+
+def _row(t):
+    return np.array([t, 0.0, 1.0, 2.0, 3.0, 4.0, -1.0])
+
+
+def _tick():
+    """Returns the current time, making sure it differs from the last one"""
+    time.sleep(0.002)
+    t = time.time()
+    time.sleep(0.002)
+    return t
+
+
+def _reply(sensor, request, rows, as_array=False):
+    part = np.array(rows) if as_array else list(rows)
+    sensor._sub_pipe_out.send((request, [part]))
+
+
+def _times(samples):
+    return [float(s[0]) for s in samples]
+
+
+def test_windows_and_cursors():
+    sensor = make_sensor()
+    sensor.subscribe("a")
+    sensor.subscribe("b")
+
+    sensor.start_recording("a")
+    r1 = _row(_tick())
+    sensor.start_recording("b")
+    r2 = _row(_tick())
+    sensor.pause_recording("a")
+    r3 = _row(_tick())
+    sensor.start_recording("a")
+    r4 = _row(_tick())
+
+    _reply(sensor, 1, [r1, r2, r3, r4])
+    assert _times(sensor.read_subscription("a")) == _times([r1, r2, r4])
+    # Data pulled for a is kept until b has read it
+    assert _times(sensor.read_subscription("b", timeout=0.0)) == _times([r2, r3, r4])
+
+    r5 = _row(_tick())
+    _reply(sensor, 3, [r5])
+    assert _times(sensor.read_subscription("a")) == _times([r5])
+    _reply(sensor, 4, [])
+    assert _times(sensor.read_subscription("b")) == _times([r5])
+    assert sensor._store == []
+
+
+def test_late_reply_is_not_lost():
+    sensor = make_sensor()
+    sensor.subscribe("a")
+    sensor.start_recording("a")
+    r1 = _row(_tick())
+    sensor.pause_recording("a")
+
+    # No reply in time; the closed window must be kept for the late reply
+    assert sensor.read_subscription("a", timeout=0.0) == []
+    assert len(sensor._subscriptions["a"].windows) == 1
+
+    # The late reply to request 1 arrives along with the reply to request 2
+    _reply(sensor, 1, [r1])
+    _reply(sensor, 2, [])
+    assert _times(sensor.read_subscription("a")) == _times([r1])
+    assert sensor._subscriptions["a"].windows == []
+
+    # Replies are matched by number, so reads do not fall one reply behind
+    sensor.start_recording("a")
+    r2 = _row(_tick())
+    _reply(sensor, 3, [r2])
+    assert _times(sensor.read_subscription("a")) == _times([r2])
+
+
+def test_memory_limited_store_spills(tmp_path):
+    row_bytes = 7 * 8
+    sensor = make_sensor(buffer_mem_limit=10 * row_bytes, spill_dir=str(tmp_path))
+    sensor.subscribe("a")
+    sensor.subscribe("b")
+    sensor.start_recording("a")
+    sensor.start_recording("b")
+
+    rows = [_row(_tick()) for _ in range(12)]
+    for i in range(3):
+        _reply(sensor, i + 1, rows[4 * i : 4 * i + 4], as_array=True)
+        data = sensor.read_subscription("a")
+        assert isinstance(data, ReSkinBuffer)
+        assert _times(data) == _times(rows[4 * i : 4 * i + 4])
+
+    # b has not read anything, so the oldest segments were moved to disk
+    assert any(isinstance(s, np.memmap) for s in sensor._store)
+    assert sensor._store_mem <= 10 * row_bytes
+    assert os.listdir(tmp_path) == []
+
+    _reply(sensor, 4, [], as_array=True)
+    assert np.array_equal(np.asarray(sensor.read_subscription("b")), np.array(rows))
+    assert sensor._store == []
+
+
+def test_subscriptions_with_dummy_sensor():
+    sensor = ReSkinProcess(
+        num_mags=5,
+        allow_dummy_sensor=True,
+        temp_filtered=True,
+        reskin_data_struct=False,
+    )
+    sensor.start()
+    time.sleep(0.5)
+    try:
+        sensor.subscribe("a")
+        sensor.subscribe("b")
+        sensor.start_recording("a")
+        start = time.time()
+        time.sleep(0.05)
+        sensor.start_recording("b")
+
+        reads = {"a": [], "b": []}
+        for _ in range(5):
+            time.sleep(0.05)
+            for name in reads:
+                reads[name].extend(_times(sensor.read_subscription(name)))
+        # Catch a up with everything b has read
+        reads["a"].extend(_times(sensor.read_subscription("a")))
+        stop = time.time()
+
+        for name, times in reads.items():
+            assert len(times) > 0
+            assert np.all(np.diff(times) > 0)
+            assert start <= times[0] and times[-1] <= stop
+        # b started recording later, so it has no samples a does not have
+        assert set(reads["b"]) <= set(reads["a"])
+        assert reads["b"][0] > reads["a"][0]
+
+        sensor.unsubscribe("a")
+        sensor.unsubscribe("b")
+        assert sensor._store == []
+    finally:
+        sensor.join()
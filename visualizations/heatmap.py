@@ -1,4 +1,4 @@
-from collections import deque
+import threading
 import time
 
 import argparse
@@ -42,24 +42,153 @@ def plot_heatmap(data, num_mags):
     plt.show()
 
 
-def update_data(ax, sensor, init_time, baseline, ln, xdata, ydata, i):
-    sensor.pause_buffering()
-    buf = np.array(sensor.get_buffer())
-    sensor.start_buffering()
-    times = buf[:, 0] - init_time
-    data = buf[:, 2:-1] - baseline
-
-    xdata.extend(list(times))
-    ydata.extend(list(data))
-
-    ln.set_array(np.array(ydata).T)
-
-    xticks = np.arange(0, len(xdata), max(1, len(xdata) // 10))
-    xlabels = ["{:.2f}".format(xdata[i]) for i in xticks]
-
-    ax.set_xticklabels(xlabels)
-
-    return (ln,)
+class RollingWindow:
+    """
+    Fixed-length window over the most recent samples, backed by a
+    preallocated array that is updated in place.
+
+    Samples are stored channel-major, and every sample is written twice,
+    ``size`` columns apart, so that the latest ``size`` samples are always
+    available as a single view of shape (num_channels, size).
+
+    Attributes
+    ----------
+    size: int
+        Number of samples held in the window
+    num_channels: int
+        Number of channels per sample
+    """
+
+    def __init__(self, size, num_channels, dtype=np.float32):
+        self.size = size
+        self.num_channels = num_channels
+        self._data = np.zeros((num_channels, 2 * size), dtype=dtype)
+        # Index of the oldest sample, which is also the next write position
+        self._head = 0
+
+    def extend(self, samples):
+        """
+        Append samples to the window, discarding the oldest ones
+
+        Parameters
+        ----------
+        samples: np.ndarray
+            Array of shape (num_samples, num_channels)
+        """
+        samples = samples[-self.size :].T
+        num_new = samples.shape[1]
+        if num_new == 0:
+            return
+
+        first = min(num_new, self.size - self._head)
+        rest = num_new - first
+        h, s = self._head, self.size
+        self._data[:, h : h + first] = samples[:, :first]
+        self._data[:, h + s : h + s + first] = samples[:, :first]
+        self._data[:, :rest] = samples[:, first:]
+        self._data[:, s : s + rest] = samples[:, first:]
+
+        self._head = (h + num_new) % s
+
+    def view(self):
+        """Return the window, oldest sample first, without copying"""
+        return self._data[:, self._head : self._head + self.size]
+
+
+def minmax_decimate(window, num_bins, out=None):
+    """
+    Reduce a window of samples to num_bins bins, keeping the minimum and
+    maximum of every bin so that short transients survive decimation.
+
+    Parameters
+    ----------
+    window: np.ndarray
+        Array of shape (num_channels, num_samples)
+    num_bins: int
+        Number of bins; typically the width of the axes in pixels
+    out: np.ndarray
+        Optional array of shape (num_channels, 2 * num_bins) to write into
+
+    Returns
+    -------
+    np.ndarray
+        Interleaved bin minima and maxima, or window itself if it already
+        has no more than num_bins samples
+    """
+    num_samples = window.shape[1]
+    if num_bins >= num_samples:
+        return window
+    if out is None or out.shape != (window.shape[0], 2 * num_bins):
+        out = np.empty((window.shape[0], 2 * num_bins), dtype=window.dtype)
+
+    edges = np.linspace(0, num_samples, num_bins, endpoint=False).astype(int)
+    np.minimum.reduceat(window, edges, axis=1, out=out[:, 0::2])
+    np.maximum.reduceat(window, edges, axis=1, out=out[:, 1::2])
+    return out
+
+
+class BufferFetcher(threading.Thread):
+    """
+    Thread that periodically reads new samples from a ReSkinProcess
+    subscription into a RollingWindow, so that rendering never waits on the
+    sensor. Recording is never paused, so no samples are skipped between reads.
+
+    Attributes
+    ----------
+    sensor: ReSkinProcess
+        Streaming sensor process, created with reskin_data_struct=False
+    window: RollingWindow
+        Window that incoming samples are appended to
+    baseline: np.ndarray
+        Baseline subtracted from incoming samples
+    lock: threading.Lock
+        Lock guarding window
+    period: float
+        Time between successive fetches, in s
+    subscriber: str
+        Name of the subscription samples are read from
+    """
+
+    def __init__(
+        self, sensor, window, baseline, lock, period=0.01, subscriber="heatmap"
+    ):
+        super(BufferFetcher, self).__init__(daemon=True)
+        self.sensor = sensor
+        self.window = window
+        self.baseline = baseline
+        self.lock = lock
+        self.period = period
+        self.subscriber = subscriber
+
+        self._event_quit_request = threading.Event()
+
+    def stop(self):
+        self._event_quit_request.set()
+
+    def run(self):
+        self.sensor.subscribe(self.subscriber)
+        self.sensor.start_recording(self.subscriber)
+        while not self._event_quit_request.is_set():
+            buf = self.sensor.read_subscription(self.subscriber)
+            if len(buf) > 0:
+                data = np.asarray(buf, dtype=np.float32)[:, 2:-1] - self.baseline
+                with self.lock:
+                    self.window.extend(data)
+            self._event_quit_request.wait(self.period)
+        self.sensor.unsubscribe(self.subscriber)
+
+
+def update_images(axs, images, windows, lock, decimated):
+    for b, (ax, im, window) in enumerate(zip(axs, images, windows)):
+        num_bins = max(1, int(ax.bbox.width))
+        with lock:
+            view = window.view()
+            frame = minmax_decimate(view, num_bins, decimated[b])
+            im.set_data(frame)
+        if frame is not view:
+            decimated[b] = frame
+
+    return images
 
 
 if __name__ == "__main__":
@@ -67,8 +196,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Visualize ReSkin data as a heatmap")
     parser.add_argument("--stream", action="store_true", help="Flag to stream live data")
     parser.add_argument("-nm", "--num-mags", type=int, required=True, help="Number of magnetometers")
-    parser.add_argument("-p", "--port", type=str, default="/dev/ttyACM0", help="ReSkin post; ignored if not streaming")
+    parser.add_argument("-p", "--port", type=str, nargs="+", default=["/dev/ttyACM0"], help="ReSkin port(s), one per board; ignored if not streaming")
     parser.add_argument("-ws", "--window-size", type=int, default=1000, help="Number of samples visualized at a time")
+    parser.add_argument("-bs", "--baseline-samples", type=int, default=100, help="Number of samples averaged for the baseline when streaming")
+    parser.add_argument("--fps", type=float, default=60., help="Target frame rate for streaming")
     parser.add_argument("--lims", type=float, nargs=2, default=[-300., 300.], help="Colorbar limits for streaming")
 
     parser.add_argument("-dp", "--data-path", type=str, help="Path for loading data")
@@ -79,43 +210,72 @@ if __name__ == "__main__":
     num_mags = args.num_mags
 
     if args.stream:
-        reskin = ReSkinProcess(
-            num_mags=args.num_mags,
-            port=args.port,
-            temp_filtered=True,
-            reskin_data_struct=False,
-        )
-        reskin.start()
+        sensors = [
+            ReSkinProcess(
+                num_mags=num_mags,
+                port=port,
+                device_id=dev_id,
+                temp_filtered=True,
+                reskin_data_struct=False,
+            )
+            for dev_id, port in enumerate(args.port)
+        ]
+        for reskin in sensors:
+            reskin.start()
         time.sleep(1.0)
-        init_data = np.array(reskin.get_data(num_samples))
-        baseline = np.mean(init_data[..., 2:-1], axis=0, keepdims=True)
-        init_time = init_data[0, 0]
-
-        reskin.start_buffering()
-
-        fig, ax = plt.subplots()
-        xdata, ydata = deque(maxlen=num_samples), deque(maxlen=num_samples)
 
-        xdata.extend(list(init_data[..., 0]) - init_time)
-        ydata.extend(list(init_data[..., 2:-1] - baseline))
-
-        ln = ax.pcolormesh(np.array(ydata).T, vmin=args.lims[0], vmax=args.lims[1])
-        ax.set_xticks(np.arange(0, num_samples, max(1, num_samples // 10)))
-        ax.set_yticks(np.linspace(0.5, num_mags * 3 - 0.5, num_mags * 3))
         ylabels = []
         for m in range(num_mags):
             ylabels.extend(["Bx{}".format(m), "By{}".format(m), "Bz{}".format(m)])
-        ax.set_yticklabels(ylabels)
-        ax.set_xlabel("Time, in s")
-        cbar = fig.colorbar(ln)
 
+        fig, axs = plt.subplots(len(sensors), 1, squeeze=False)
+        axs = axs[:, 0]
+        lock = threading.Lock()
+        windows, images, fetchers = [], [], []
+        for ax, reskin in zip(axs, sensors):
+            init_data = np.array(reskin.get_data(args.baseline_samples))
+            baseline = np.mean(init_data[..., 2:-1], axis=0, keepdims=True)
+
+            window = RollingWindow(num_samples, num_mags * 3)
+            windows.append(window)
+            fetchers.append(BufferFetcher(reskin, window, baseline, lock))
+
+            im = ax.imshow(
+                window.view(),
+                aspect="auto",
+                interpolation="nearest",
+                origin="lower",
+                extent=(-num_samples, 0, 0, num_mags * 3),
+                vmin=args.lims[0],
+                vmax=args.lims[1],
+                animated=True,
+            )
+            images.append(im)
+            ax.set_yticks(np.linspace(0.5, num_mags * 3 - 0.5, num_mags * 3))
+            ax.set_yticklabels(ylabels)
+            ax.set_ylabel("Board {}".format(reskin.device_id))
+        axs[-1].set_xlabel("Samples before present")
+        cbar = fig.colorbar(images[0], ax=list(axs))
+
+        for fetcher in fetchers:
+            fetcher.start()
+
+        decimated = [None] * len(sensors)
         ani = FuncAnimation(
             fig,
-            lambda i: update_data(ax, reskin, init_time, baseline, ln, xdata, ydata, i),
-            blit=False,
+            lambda i: update_images(axs, images, windows, lock, decimated),
+            interval=1000.0 / args.fps,
+            blit=True,
+            cache_frame_data=False,
         )
         plt.show()
 
+        for fetcher in fetchers:
+            fetcher.stop()
+            fetcher.join()
+        for reskin in sensors:
+            reskin.join()
+
     else:
         data_path = args.data_path
 
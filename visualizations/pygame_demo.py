@@ -1,87 +1,149 @@
-import pygame
+import argparse
+import json
 import sys
-from pygame.locals import *
-import math
 import time
+
 import numpy as np
-from reskin_sensor import ReSkinBase
+import pygame
+from pygame.locals import *
+
+from reskin_sensor import ReSkinProcess
 
-def init_pygame():
+
+def init_pygame(screen_size, background):
     time.sleep(1)
     pygame.init() # initialize pygame
     clock = pygame.time.Clock()
-    screen = pygame.display.set_mode((420,600))
-    bg = pygame.image.load("./images/3D.PNG")
+    screen = pygame.display.set_mode(screen_size)
+    bg = pygame.image.load(background)
     pygame.mouse.set_visible(1)
 
-    pygame.display.set_caption('5X Board Visual')
+    pygame.display.set_caption('ReSkin Board Visual')
     return clock, screen, bg
 
-def get_baseline(sens, num_samples):
+def load_config(config_path):
+    """
+    Load board geometry from a JSON config file
+
+    Returns
+    -------
+    config: dict
+        Parsed config
+    chip_locations: np.ndarray
+        Chip locations in pixels on the game board, of shape (num_chips, 2)
+    chip_orientations: np.ndarray
+        Rotation from chip axes to the pygame coordinate system, of shape
+        (num_chips, 3, 3)
+    """
+    with open(config_path, "r") as f:
+        config = json.load(f)
+
+    chip_locations, chip_orientations = [], []
+    for board in config["boards"]:
+        chip_locations.append(
+            np.array(board["chip_locations"]) + np.array(board["offset"])
+        )
+        chip_orientations.append(np.array(board["chip_orientations"]))
+
+    return (
+        config,
+        np.concatenate(chip_locations).astype(float),
+        np.concatenate(chip_orientations).astype(float),
+    )
+
+def get_baseline(sensors, num_samples):
     print("Leave board resting on table")
     time.sleep(2.)
 
-    baseline_samples = sens.get_data(num_samples)
-    baseline = [s.data for s in baseline_samples]
-    baseline = np.array(baseline)
-    baseline = np.mean(baseline, axis=0)
+    baseline = []
+    for sens in sensors:
+        baseline_samples = sens.get_data(num_samples)
+        baseline.append(np.mean([s.data for s in baseline_samples], axis=0))
+    baseline = np.concatenate(baseline).reshape(-1, 3)
     print("Resting data collected.")
 
     return baseline
 
+def get_arrows(readings, baseline, chip_locations, chip_orientations, scale):
+    """
+    Compute arrow endpoints and circle radii for all chips at once
+
+    Parameters
+    ----------
+    readings: np.ndarray
+        Latest temperature-filtered readings, of shape (num_chips, 3)
+    """
+    field = np.einsum(
+        "nij,nj->ni", chip_orientations, readings - baseline
+    )
+    ends = chip_locations + field[:, 1::-1]
+    radii = np.abs(field[:, 2]) / scale
+
+    return ends, radii
+
 
 if __name__ == '__main__':
-    
+    # fmt: off
+    parser = argparse.ArgumentParser(description="Visualize ReSkin data as a vector field")
+    parser.add_argument("-c", "--config", type=str, default="./configs/5X.json", help="Path to board geometry config")
+    parser.add_argument("--fps", type=int, default=60, help="Frame rate at which the board is drawn")
+    parser.add_argument("--scale", type=float, default=100., help="Scale for the z-field circles")
+    parser.add_argument("-bs", "--baseline-samples", type=int, default=100, help="Number of samples averaged for the baseline")
+    args = parser.parse_args()
+    # fmt: on
+
     WHITE = pygame.Color(255, 255, 255)
-    RED = pygame.Color(255, 0, 0) 
+    RED = pygame.Color(255, 0, 0)
     BLACK = pygame.Color(0,0,0)
 
-    viz_sensor = ReSkinBase(num_mags=5, port='/dev/ttyACM0', baudrate=115200)
-    scale = 100
+    config, chip_locations, chip_orientations = load_config(args.config)
 
-    temp_mask = np.ones((20,),dtype=bool)
-    temp_mask[::4] = False
-    
-    clock, screen, bg = init_pygame()
-    
-    # read first 100 samples as baseline
-    numBaselineSamples = 100
+    sensors = [
+        ReSkinProcess(
+            num_mags=len(board["chip_locations"]),
+            port=board["port"],
+            baudrate=board.get("baudrate", 115200),
+            device_id=dev_id,
+            temp_filtered=True,
+        )
+        for dev_id, board in enumerate(config["boards"])
+    ]
+    for sens in sensors:
+        sens.start()
 
-    baseline = get_baseline(viz_sensor, numBaselineSamples)
+    clock, screen, bg = init_pygame(config["screen_size"], config["background"])
 
-    # chip locations in pixels on the game board
-    # in order of center, top, right, bottom, left to match incoming data stream
-    chip_locations = np.array([[211,204], [211, 60],[357, 206],[211, 353],[67, 204]])
+    baseline = get_baseline(sensors, args.baseline_samples)
 
+    centers = [tuple(c) for c in chip_locations]
+    readings = np.empty_like(baseline)
     while True:
-
-        raw_data = viz_sensor.get_data(1)
-        input_data = raw_data[0].data - baseline
-        #rotation of chip axes to pygame coordinate system
-
-        input_data = input_data[temp_mask]
-        input_data[0:3] = [input_data[1], -1*input_data[0], -1*input_data[2]]
-        input_data[3:6] = [input_data[4], -1*input_data[3], -1*input_data[5]]
-        input_data[6:9] = [input_data[6], input_data[7], -1*input_data[8]]
-        input_data[9:12] = [-1*input_data[9], -1*input_data[10], -1*input_data[11]]
-        input_data[12:15] = [-1*input_data[13], input_data[12], -1*input_data[14]]
-
-        screen.blit(bg, (0,0))
-        for idx in range(5):
-            center_arrow = chip_locations[idx]
-            angle = math.atan2(input_data[3*idx+1],input_data[3*idx])
-            z = math.sqrt((input_data[3*idx]*input_data[3*idx]+input_data[3*idx+1]*input_data[3*idx+1]))
-            x = center_arrow[0] + math.sin(angle)*z
-            y = center_arrow[1] + math.cos(angle)*z
-            r = abs(input_data[3*idx+2])/scale
-            pygame.draw.line(screen, (0,0,0), center_arrow, (x,y), 5)
-            pygame.draw.circle(screen, (0,0,1), center_arrow, r, 1)
+        # Latest readings are read from the background processes without
+        # waiting for new samples
+        offset = 0
+        for sens in sensors:
+            last = np.array(sens.last_reading.data).reshape(-1, 3)
+            readings[offset:offset + len(last)] = last
+            offset += len(last)
+
+        ends, radii = get_arrows(
+            readings, baseline, chip_locations, chip_orientations, args.scale
+        )
+
+        for board in config["boards"]:
+            screen.blit(bg, board["offset"])
+        for center, end, r in zip(centers, ends.tolist(), radii.tolist()):
+            pygame.draw.line(screen, (0,0,0), center, end, 5)
+            pygame.draw.circle(screen, (0,0,1), center, r, 1)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                for sens in sensors:
+                    sens.join()
                 sys.exit()
             elif event.type == KEYDOWN:
                 if event.key == ord('b'):
-                    baseline = get_baseline(viz_sensor, numBaselineSamples)
+                    baseline = get_baseline(sensors, args.baseline_samples)
 
-        pygame.display.update()
\ No newline at end of file
+        pygame.display.update()
+        clock.tick(args.fps)